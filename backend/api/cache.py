@@ -0,0 +1,158 @@
+"""
+Cache backends for HungryJack
+This module provides async key/value caches for expensive results such as OpenAI completions
+"""
+
+import os
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Optional, Tuple, Union
+
+try:
+    import redis.asyncio as redis
+except ImportError:  # Redis is optional; without it caches stay in process
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+def completion_cache_key(model: str, temperature: float, system_prompt: str, user_prompt: str) -> str:
+    """
+    Build a cache key for a chat completion request.
+    
+    Args:
+        model: The model the completion is requested from
+        temperature: The sampling temperature
+        system_prompt: The system message
+        user_prompt: The user message
+    
+    Returns:
+        A hex digest identifying the request
+    """
+    payload = f"{model}|{temperature}|{system_prompt}|{user_prompt}".encode()
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+class MemoryCache:
+    """In-process LRU cache with per-entry expiry."""
+    
+    def __init__(self, maxsize: int = 4096):
+        """
+        Initialize the cache.
+        
+        Args:
+            maxsize: Maximum number of entries kept before the least recently used is evicted
+        """
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Tuple[Optional[float], str]]" = OrderedDict()
+    
+    async def get(self, key: str) -> Optional[str]:
+        """
+        Get a value from the cache.
+        
+        Args:
+            key: The key to look up
+        
+        Returns:
+            The cached value, or None if missing or expired
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        
+        self._entries.move_to_end(key)
+        return value
+    
+    async def set(self, key: str, value: str, ex: Optional[int] = None) -> None:
+        """
+        Store a value in the cache.
+        
+        Args:
+            key: The key to store the value under
+            value: The value to store
+            ex: Seconds until the value expires, or None to keep it until evicted
+        """
+        expires_at = time.monotonic() + ex if ex is not None else None
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+    
+    async def delete(self, key: str) -> None:
+        """
+        Remove a value from the cache.
+        
+        Args:
+            key: The key to remove
+        """
+        self._entries.pop(key, None)
+
+class RedisCache:
+    """Cache shared between workers and kept across restarts, backed by Redis."""
+    
+    def __init__(self, client):
+        """
+        Initialize the cache.
+        
+        Args:
+            client: A redis.asyncio client created with decode_responses=True
+        """
+        self._client = client
+    
+    async def get(self, key: str) -> Optional[str]:
+        """
+        Get a value from the cache.
+        
+        Args:
+            key: The key to look up
+        
+        Returns:
+            The cached value, or None if missing, expired or Redis is unreachable
+        """
+        try:
+            return await self._client.get(key)
+        except Exception:
+            # A cache outage only costs a regeneration, never the request
+            logger.exception("Error reading from Redis cache")
+            return None
+    
+    async def set(self, key: str, value: str, ex: Optional[int] = None) -> None:
+        """
+        Store a value in the cache.
+        
+        Args:
+            key: The key to store the value under
+            value: The value to store
+            ex: Seconds until the value expires, or None to keep it until evicted
+        """
+        try:
+            await self._client.set(key, value, ex=ex)
+        except Exception:
+            logger.exception("Error writing to Redis cache")
+    
+    async def delete(self, key: str) -> None:
+        """
+        Remove a value from the cache.
+        
+        Args:
+            key: The key to remove
+        """
+        try:
+            await self._client.delete(key)
+        except Exception:
+            logger.exception("Error deleting from Redis cache")
+
+def create_cache() -> Union[MemoryCache, RedisCache]:
+    """Create the cache backend, using Redis when REDIS_URL is set."""
+    redis_url = os.getenv("REDIS_URL")
+    if not redis_url:
+        return MemoryCache()
+    if redis is None:
+        logger.warning("REDIS_URL is set but the redis package is not installed; using the in-memory cache")
+        return MemoryCache()
+    return RedisCache(redis.from_url(redis_url, decode_responses=True))
@@ -3,13 +3,44 @@ Meal Plan Service for HungryJack
 This module handles the generation of meal plans using dietary profiles
 """
 
-from typing import Dict, List, Optional
-import json
-import os
-from dotenv import load_dotenv
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+import re
+from fractions import Fraction
+from itertools import chain
 
-# Load environment variables
-load_dotenv()
+# Units recognized in ingredient quantities, in their singular form
+_UNITS = ("cup", "tbsp", "tsp", "oz", "g", "kg", "ml", "l", "pound", "lb", "piece", "slice", "clove")
+
+# Splits an ingredient such as "4 oz grilled chicken" into its quantity and name
+_QTY_RE = re.compile(
+    r"^([\d/\.\s]+(?:(?:" + "|".join(_UNITS) + r")s?\b)?)\s*(?:of\s+)?(.+)$",
+    re.IGNORECASE
+)
+
+# Splits a quantity such as "1 1/2 cups" into its amount and unit
+_AMOUNT_RE = re.compile(r"^(\d+(?:\.\d+)?(?:/\d+)?)(?:\s+(\d+/\d+))?\s*(.*)$")
+
+# Keywords used to categorize shopping list ingredients, in priority order
+_CATEGORIES = {
+    "protein": ["chicken", "salmon", "eggs", "beef", "pork", "tofu"],
+    "produce": ["vegetable", "avocado", "greens", "spinach", "lettuce", "tomato"],
+    "grains": ["bread", "rice", "quinoa", "pasta", "oats"],
+    "dairy": ["milk", "cheese", "yogurt", "butter"]
+}
+_CATEGORY_PRIORITY = {category: index for index, category in enumerate(_CATEGORIES)}
+
+# Order categories appear in on the shopping list
+_SHOPPING_CATEGORY_ORDER = {**_CATEGORY_PRIORITY, "other": len(_CATEGORY_PRIORITY)}
+
+# Names categories are shown under on a generated shopping list
+_CATEGORY_NAMES = {"protein": "Protein", "produce": "Produce", "grains": "Grains", "dairy": "Dairy"}
+
+# Inverted keyword -> category index
+_KEYWORD_TO_CAT = {keyword: category for category, keywords in _CATEGORIES.items() for keyword in keywords}
+
+# Every keyword in one precompiled alternation (longest first) so each
+# ingredient is scanned once, in C, regardless of the number of keywords
+_KEYWORD_RE = re.compile("|".join(sorted(map(re.escape, _KEYWORD_TO_CAT), key=len, reverse=True)))
 
 class MealPlanService:
     """Service for generating meal plans based on dietary profiles"""
@@ -98,6 +129,153 @@ class MealPlanService:
         
         return meal_plan
     
+    @staticmethod
+    def _categorize_ingredient(ingredient: str) -> str:
+        """
+        Categorize an ingredient for the shopping list
+        
+        Args:
+            ingredient: The ingredient to categorize
+            
+        Returns:
+            The category name, or "other" if no keyword matches
+        """
+        hits = _KEYWORD_RE.findall(ingredient.casefold())
+        if hits:
+            # Prefer the longest keyword, breaking ties by category priority
+            keyword = max(hits, key=lambda hit: (len(hit), -_CATEGORY_PRIORITY[_KEYWORD_TO_CAT[hit]]))
+            return _KEYWORD_TO_CAT[keyword]
+        
+        return "other"
+    
+    @staticmethod
+    def _process_ingredients(ingredients: Iterable[str]) -> List[Tuple[str, str, str]]:
+        """
+        Deduplicate, split and categorize ingredients for the shopping list
+        
+        Args:
+            ingredients: Ingredient strings such as "4 oz grilled chicken"
+            
+        Returns:
+            (name, quantity, category) tuples for each distinct ingredient, in
+            first-seen order
+        """
+        processed = []
+        seen = set()
+        for ingredient in ingredients:
+            # Duplicates are detected case-insensitively so each distinct
+            # ingredient is split and categorized only once
+            key = ingredient.casefold()
+            if key in seen:
+                continue
+            seen.add(key)
+            
+            name, quantity = MealPlanService._split_ingredient(ingredient)
+            processed.append((name, quantity, MealPlanService._categorize_ingredient(key)))
+        
+        return processed
+    
+    @staticmethod
+    def _split_ingredient(ingredient: str) -> Tuple[str, str]:
+        """
+        Split an ingredient into its name and quantity
+        
+        Args:
+            ingredient: An ingredient string such as "4 oz grilled chicken"
+            
+        Returns:
+            (name, quantity), with a quantity of "1" if none is given
+        """
+        match = _QTY_RE.match(ingredient)
+        if match:
+            return match.group(2), match.group(1).strip()
+        return ingredient, "1"
+    
+    @staticmethod
+    def _parse_quantity(quantity: str) -> Optional[Tuple[Fraction, str]]:
+        """
+        Parse a quantity into an exact amount and a normalized unit
+        
+        Args:
+            quantity: A quantity such as "1/2 cup" or "2 cloves"
+            
+        Returns:
+            (amount, unit), with the unit singular and lowercase, or None if
+            the quantity does not start with a valid number
+        """
+        match = _AMOUNT_RE.match(quantity.strip())
+        if not match:
+            return None
+        try:
+            amount = Fraction(match.group(1))
+            if match.group(2):
+                amount += Fraction(match.group(2))
+        except (ValueError, ZeroDivisionError):
+            # Amounts like "1/0" or "1.5/2" are kept as written
+            return None
+        unit = match.group(3).casefold()
+        if unit.endswith("s") and unit[:-1] in _UNITS:
+            unit = unit[:-1]
+        return amount, unit
+    
+    @staticmethod
+    def _format_amount(amount: Fraction) -> str:
+        """Format an amount as a whole or mixed number such as 2 or 1 1/2"""
+        whole, part = divmod(amount, 1)
+        if not part:
+            return str(whole)
+        return f"{whole} {part}" if whole else str(part)
+    
+    @staticmethod
+    def categorize_ingredients(ingredients: Mapping[str, int]) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """
+        Total and categorize ingredients for the shopping list with the local keyword table
+        
+        Amounts of the same ingredient in the same unit are summed exactly, so
+        "1/2 cup quinoa" in two meals and "1 cup quinoa" in another total 2 cups.
+        
+        Args:
+            ingredients: Ingredient strings such as "4 oz grilled chicken", with
+                the number of meals that use each
+            
+        Returns:
+            The matched categories as {"name", "items"} dicts in shopping list
+            order, and the ingredients no keyword matched
+        """
+        # (category, name, unit) -> [display name, total amount], or the raw
+        # quantity for quantities that are not numbers
+        totals: Dict[Tuple[str, str, str], List[Any]] = {}
+        unmatched = []
+        for ingredient, occurrences in ingredients.items():
+            category = MealPlanService._categorize_ingredient(ingredient.casefold())
+            if category == "other":
+                unmatched.append(ingredient)
+                continue
+            name, quantity = MealPlanService._split_ingredient(ingredient)
+            parsed = MealPlanService._parse_quantity(quantity)
+            if parsed is None:
+                totals[(category, name.casefold(), quantity)] = [name, quantity]
+                continue
+            amount, unit = parsed
+            total = totals.setdefault((category, name.casefold(), unit), [name, Fraction(0)])
+            total[1] += amount * occurrences
+        
+        grouped: Dict[str, List[Dict[str, str]]] = {}
+        for (category, _, unit), (name, amount) in totals.items():
+            if isinstance(amount, Fraction):
+                quantity = MealPlanService._format_amount(amount)
+            else:
+                quantity, unit = amount, ""
+            grouped.setdefault(category, []).append(
+                {"item_name": name, "quantity": quantity, "unit": unit, "note": ""}
+            )
+        
+        categories = [
+            {"name": _CATEGORY_NAMES[category], "items": grouped[category]}
+            for category in sorted(grouped, key=_SHOPPING_CATEGORY_ORDER.__getitem__)
+        ]
+        return categories, unmatched
+    
     @staticmethod
     async def generate_shopping_list(meal_plan: Dict) -> Dict:
         """
@@ -112,48 +290,26 @@ class MealPlanService:
         # This is a placeholder implementation
         
         # Extract all ingredients from the meal plan
-        all_ingredients = []
-        for day in meal_plan.get("days", []):
-            for meal in day.get("meals", []):
-                all_ingredients.extend(meal.get("ingredients", []))
-        
-        # Deduplicate and categorize ingredients (simplified)
-        categorized_items = {
-            "protein": [],
-            "produce": [],
-            "grains": [],
-            "dairy": [],
-            "other": []
-        }
+        all_ingredients = chain.from_iterable(
+            meal.get("ingredients", ())
+            for day in meal_plan.get("days", ())
+            for meal in day.get("meals", ())
+        )
         
-        # Simple categorization logic
-        for ingredient in all_ingredients:
-            if any(protein in ingredient.lower() for protein in ["chicken", "salmon", "eggs", "beef", "pork", "tofu"]):
-                if ingredient not in categorized_items["protein"]:
-                    categorized_items["protein"].append(ingredient)
-            elif any(produce in ingredient.lower() for produce in ["vegetable", "avocado", "greens", "spinach", "lettuce", "tomato"]):
-                if ingredient not in categorized_items["produce"]:
-                    categorized_items["produce"].append(ingredient)
-            elif any(grain in ingredient.lower() for grain in ["bread", "rice", "quinoa", "pasta", "oats"]):
-                if ingredient not in categorized_items["grains"]:
-                    categorized_items["grains"].append(ingredient)
-            elif any(dairy in ingredient.lower() for dairy in ["milk", "cheese", "yogurt", "butter"]):
-                if ingredient not in categorized_items["dairy"]:
-                    categorized_items["dairy"].append(ingredient)
-            else:
-                if ingredient not in categorized_items["other"]:
-                    categorized_items["other"].append(ingredient)
+        # Deduplicate and categorize ingredients, then group them by category
+        processed = MealPlanService._process_ingredients(all_ingredients)
+        processed.sort(key=lambda entry: _SHOPPING_CATEGORY_ORDER[entry[2]])
         
         # Create shopping list items
-        shopping_list_items = []
-        for category, items in categorized_items.items():
-            for item in items:
-                shopping_list_items.append({
-                    "item_name": item,
-                    "category": category,
-                    "quantity": "1",  # Simplified
-                    "is_purchased": False
-                })
+        shopping_list_items = [
+            {
+                "item_name": name,
+                "category": category,
+                "quantity": quantity,
+                "is_purchased": False
+            }
+            for name, quantity, category in processed
+        ]
         
         # Create shopping list
         shopping_list = {
@@ -2,10 +2,33 @@
 Nutrition service for calculating and enhancing nutritional data for meals.
 """
 import os
-import json
+import re
+import asyncio
+import logging
+import functools
+import importlib.util
 import httpx
-from typing import Dict, List, Optional, Any, Union
-from pydantic import BaseModel
+import orjson
+from typing import Dict, List, NamedTuple, Optional, Any, Tuple, Union
+from aiolimiter import AsyncLimiter
+from cachetools import LRUCache
+from tenacity import AsyncRetrying, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
+from pydantic import BaseModel, ConfigDict, field_serializer
+
+USDA_API_BASE_URL = "https://api.nal.usda.gov"
+
+logger = logging.getLogger(__name__)
+
+# HTTP/2 needs the optional h2 package
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# USDA responses worth retrying: rate limited or a transient server error
+_USDA_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+_USDA_BACKOFF = wait_exponential_jitter(initial=0.5, max=10)
+
+# USDA nutrient IDs for energy, protein, carbohydrates, fat, fiber, sugars, sodium and cholesterol
+_USDA_NUTRIENT_IDS = frozenset({1008, 1003, 1005, 1004, 1079, 2000, 1093, 1253})
 
 class NutrientInfo(BaseModel):
     """Nutrient information model."""
@@ -14,8 +37,19 @@ class NutrientInfo(BaseModel):
     unit: str
     percent_daily_value: Optional[float] = None
 
+class _RawNutrient(NamedTuple):
+    """A USDA nutrient kept as a plain tuple until the response is serialized."""
+    name: str
+    amount: float
+    unit: str
+    percent_daily_value: Optional[float] = None
+
 class NutritionData(BaseModel):
     """Nutrition data model for a food item."""
+    # Frozen because estimates and USDA lookups are memoized and shared
+    # between callers
+    model_config = ConfigDict(frozen=True)
+    
     calories: float
     protein_grams: float
     carbs_grams: float
@@ -24,7 +58,97 @@ class NutritionData(BaseModel):
     sugar_grams: Optional[float] = None
     sodium_mg: Optional[float] = None
     cholesterol_mg: Optional[float] = None
-    detailed_nutrients: Optional[List[NutrientInfo]] = None
+    detailed_nutrients: Optional[List[Union[NutrientInfo, _RawNutrient]]] = None
+    
+    @field_serializer("detailed_nutrients")
+    def _serialize_detailed_nutrients(self, nutrients):
+        """Serialize raw nutrient tuples in the same shape as NutrientInfo."""
+        if nutrients is None:
+            return None
+        return [
+            nutrient._asdict() if isinstance(nutrient, tuple) else nutrient.model_dump()
+            for nutrient in nutrients
+        ]
+
+def _estimate(calories: float, protein_grams: float, carbs_grams: float, fat_grams: float) -> NutritionData:
+    """Build an estimated NutritionData with only the macro fields set."""
+    return NutritionData(
+        calories=calories,
+        protein_grams=protein_grams,
+        carbs_grams=carbs_grams,
+        fat_grams=fat_grams,
+        fiber_grams=None,
+        sugar_grams=None,
+        sodium_mg=None,
+        cholesterol_mg=None
+    )
+
+# Food categories used to estimate nutrition, in priority order, with the
+# keywords that identify them and their estimated nutrition
+_ESTIMATE_CATEGORIES = {
+    # Protein-rich foods
+    "protein": (("chicken", "beef", "fish", "meat", "turkey", "pork"), _estimate(250, 25, 0, 15)),
+    # Vegetables
+    "vegetable": (("salad", "vegetable", "broccoli", "spinach", "kale"), _estimate(50, 2, 10, 0)),
+    # Carb-rich foods
+    "carb": (("rice", "pasta", "bread", "potato", "grain"), _estimate(200, 5, 40, 1)),
+    # Fruits
+    "fruit": (("fruit", "apple", "banana", "berry", "orange"), _estimate(100, 1, 25, 0)),
+    # Dairy
+    "dairy": (("yogurt", "milk", "cheese", "dairy"), _estimate(150, 10, 12, 8)),
+    # Nuts and seeds
+    "nut": (("nut", "seed", "almond", "walnut", "peanut"), _estimate(180, 6, 6, 16)),
+    # Fats and oils
+    "fat": (("oil", "butter", "fat"), _estimate(120, 0, 0, 14)),
+}
+
+_DEFAULT_ESTIMATE = _estimate(200, 10, 20, 10)
+
+# Estimates indexed by category priority, with the default last
+_ESTIMATE_VALUES = tuple(values for _, values in _ESTIMATE_CATEGORIES.values()) + (_DEFAULT_ESTIMATE,)
+
+_CATEGORY_RANKS = {category: rank for rank, category in enumerate(_ESTIMATE_CATEGORIES)}
+
+# Caps concurrent per-ingredient lookups when a meal is calculated
+_INGREDIENT_CONCURRENCY = 16
+
+# One regex tries each category in priority order: a branch is an empty named
+# group guarded by a lookahead for any of that category's keywords, so the
+# first category with a keyword anywhere in the name wins and its name is
+# reported by match.lastgroup
+_CATEGORY_RE = re.compile(
+    "^(?:" + "|".join(
+        f"(?=.*?(?:{'|'.join(map(re.escape, keywords))}))(?P<{category}>)"
+        for category, (keywords, _) in _ESTIMATE_CATEGORIES.items()
+    ) + ")",
+    re.DOTALL
+)
+
+# Keywords are single words, so a food name is classified word by word after
+# punctuation is turned into spaces
+_WORD_TRANS = str.maketrans(",.;:()/-", "        ")
+
+_DEFAULT_RANK = len(_ESTIMATE_CATEGORIES)
+
+# Words that are exactly a keyword are ranked by set lookup instead of the regex
+_KEYWORD_RANKS = {
+    keyword: _CATEGORY_RANKS[_CATEGORY_RE.match(keyword).lastgroup]
+    for keywords, _ in _ESTIMATE_CATEGORIES.values()
+    for keyword in keywords
+}
+
+@functools.lru_cache(maxsize=4096)
+def _word_rank(word: str) -> int:
+    """Priority of the first category with a keyword in the word, or _DEFAULT_RANK if none."""
+    rank = _KEYWORD_RANKS.get(word)
+    if rank is not None:
+        return rank
+    match = _CATEGORY_RE.match(word)
+    return _CATEGORY_RANKS[match.lastgroup] if match else _DEFAULT_RANK
+
+def _usda_cache_key(food_name: str, quantity: Optional[str], include_detailed: bool) -> Tuple[str, Optional[str], bool]:
+    """Normalize a USDA lookup into a cache key."""
+    return (food_name.lower().strip(), quantity, include_detailed)
 
 class NutritionService:
     """Service for calculating and enhancing nutritional data for meals."""
@@ -33,11 +157,30 @@ class NutritionService:
         """Initialize the nutrition service."""
         self.usda_api_key = os.environ.get("USDA_API_KEY")
         self.use_usda_api = self.usda_api_key is not None and self.usda_api_key != ""
+        # Long-lived client so the search and detail lookups reuse pooled
+        # keep-alive connections instead of a new TLS handshake per request
+        self._client = httpx.AsyncClient(
+            base_url=USDA_API_BASE_URL,
+            http2=_HTTP2_AVAILABLE,
+            timeout=10.0,
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32)
+        )
+        # USDA results keyed by normalized (food name, quantity)
+        self._usda_cache: LRUCache = LRUCache(maxsize=4096)
+        # Token bucket that smooths bursts of lookups to stay within the key's quota
+        self._limiter = AsyncLimiter(max_rate=int(os.getenv("USDA_MAX_RPS", "30")), time_period=1)
+        # USDA lookups currently in progress, by the same key
+        self._inflight: Dict[Tuple[str, Optional[str], bool], asyncio.Task] = {}
+    
+    async def aclose(self) -> None:
+        """Close the HTTP client. Called on application shutdown."""
+        await self._client.aclose()
     
     async def get_nutrition_data(self, 
                                  food_name: str, 
                                  quantity: Optional[str] = None,
-                                 estimated_data: Optional[Dict[str, Any]] = None) -> NutritionData:
+                                 estimated_data: Optional[Dict[str, Any]] = None,
+                                 include_detailed: bool = False) -> NutritionData:
         """
         Get nutrition data for a food item.
         
@@ -45,6 +188,7 @@ class NutritionService:
             food_name: The name of the food item
             quantity: The quantity of the food item (e.g. "1 cup")
             estimated_data: Estimated nutrition data from OpenAI
+            include_detailed: Whether to include the full USDA nutrient breakdown
             
         Returns:
             Nutrition data for the food item
@@ -65,31 +209,97 @@ class NutritionService:
         # If USDA API key is available, use it to get more accurate data
         if self.use_usda_api:
             try:
-                return await self._get_usda_nutrition_data(food_name, quantity)
+                return await self._get_usda_nutrition_data_coalesced(food_name, quantity, include_detailed)
             except Exception as e:
                 # If USDA API fails, fall back to estimated data
-                print(f"Error getting USDA nutrition data: {str(e)}")
+                logger.warning("Error getting USDA nutrition data: %s", e)
                 return self._get_estimated_nutrition_data(food_name)
         else:
             # If no USDA API key, use estimated data
             return self._get_estimated_nutrition_data(food_name)
     
+    async def _get_usda_nutrition_data_coalesced(self,
+                                                 food_name: str,
+                                                 quantity: Optional[str] = None,
+                                                 include_detailed: bool = False) -> NutritionData:
+        """
+        Get nutrition data from the USDA API, sharing in-flight lookups.
+        
+        Concurrent callers asking for the same food await a single USDA
+        lookup instead of each making their own round trips.
+        
+        Args:
+            food_name: The name of the food item
+            quantity: The quantity of the food item (e.g. "1 cup")
+            include_detailed: Whether to build the full detailed_nutrients list
+            
+        Returns:
+            Nutrition data for the food item
+        """
+        cache_key = _usda_cache_key(food_name, quantity, include_detailed)
+        cached = self._usda_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        task = self._inflight.get(cache_key)
+        if task is None:
+            task = asyncio.create_task(self._get_usda_nutrition_data(food_name, quantity, include_detailed))
+            self._inflight[cache_key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(cache_key, None))
+        
+        # Shielded so one caller being cancelled does not cancel the lookup
+        # the other callers are waiting on
+        return await asyncio.shield(task)
+    
+    async def _usda_get(self, path: str, params: Dict[str, Any]) -> httpx.Response:
+        """
+        Make a rate-limited GET request to the USDA API.
+        
+        Each attempt waits for a token from the rate limiter, and rate limited
+        or transient server errors are retried with exponential backoff.
+        
+        Args:
+            path: The API path to request
+            params: Query parameters for the request
+            
+        Returns:
+            The USDA API response
+        """
+        async for attempt in AsyncRetrying(
+            stop=stop_after_attempt(4),
+            wait=_USDA_BACKOFF,
+            retry=retry_if_exception_type(httpx.HTTPStatusError),
+            reraise=True
+        ):
+            with attempt:
+                async with self._limiter:
+                    response = await self._client.get(path, params=params)
+                if response.status_code in _USDA_RETRY_STATUSES:
+                    response.raise_for_status()
+        return response
+    
     async def _get_usda_nutrition_data(self, 
                                        food_name: str, 
-                                       quantity: Optional[str] = None) -> NutritionData:
+                                       quantity: Optional[str] = None,
+                                       include_detailed: bool = False) -> NutritionData:
         """
         Get nutrition data from the USDA API.
         
         Args:
             food_name: The name of the food item
             quantity: The quantity of the food item (e.g. "1 cup")
+            include_detailed: Whether to build the full detailed_nutrients list
             
         Returns:
             Nutrition data for the food item
         """
+        cache_key = _usda_cache_key(food_name, quantity, include_detailed)
+        cached = self._usda_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
             # First, search for the food item
-            search_url = f"https://api.nal.usda.gov/fdc/v1/foods/search"
             params = {
                 "api_key": self.usda_api_key,
                 "query": food_name,
@@ -97,84 +307,95 @@ class NutritionService:
                 "pageSize": 1
             }
             
-            async with httpx.AsyncClient() as client:
-                search_response = await client.get(search_url, params=params)
-                search_data = search_response.json()
-                
-                if not search_data.get("foods") or len(search_data["foods"]) == 0:
-                    # If no results, fall back to estimated data
-                    return self._get_estimated_nutrition_data(food_name)
-                
-                # Get the first food item
-                food_item = search_data["foods"][0]
-                food_id = food_item["fdcId"]
-                
-                # Get detailed nutrition data for the food item
-                detail_url = f"https://api.nal.usda.gov/fdc/v1/food/{food_id}"
-                detail_params = {
-                    "api_key": self.usda_api_key
-                }
-                
-                detail_response = await client.get(detail_url, params=detail_params)
-                detail_data = detail_response.json()
-                
-                # Extract nutrition data
-                nutrients = detail_data.get("foodNutrients", [])
-                
-                # Initialize nutrition data
-                nutrition_data = {
-                    "calories": 0,
-                    "protein_grams": 0,
-                    "carbs_grams": 0,
-                    "fat_grams": 0,
-                    "fiber_grams": 0,
-                    "sugar_grams": 0,
-                    "sodium_mg": 0,
-                    "cholesterol_mg": 0,
-                    "detailed_nutrients": []
-                }
-                
-                # Map nutrient IDs to our fields
-                nutrient_map = {
-                    1008: "calories",  # Energy (kcal)
-                    1003: "protein_grams",  # Protein
-                    1005: "carbs_grams",  # Carbohydrates
-                    1004: "fat_grams",  # Total lipid (fat)
-                    1079: "fiber_grams",  # Fiber, total dietary
-                    2000: "sugar_grams",  # Sugars, total
-                    1093: "sodium_mg",  # Sodium
-                    1253: "cholesterol_mg"  # Cholesterol
-                }
-                
-                for nutrient in nutrients:
-                    nutrient_id = nutrient.get("nutrient", {}).get("id")
-                    if nutrient_id in nutrient_map:
-                        field_name = nutrient_map[nutrient_id]
-                        amount = nutrient.get("amount", 0)
-                        nutrition_data[field_name] = amount
-                    
-                    # Add to detailed nutrients
-                    if nutrient.get("amount") and nutrient.get("nutrient", {}).get("name"):
-                        detailed_nutrient = NutrientInfo(
-                            name=nutrient["nutrient"]["name"],
-                            amount=nutrient["amount"],
-                            unit=nutrient["nutrient"].get("unitName", "g"),
-                            percent_daily_value=nutrient.get("percentDailyValue")
-                        )
-                        nutrition_data["detailed_nutrients"].append(detailed_nutrient)
+            search_response = await self._usda_get("/fdc/v1/foods/search", params)
+            search_data = orjson.loads(search_response.content)
+            
+            if not search_data.get("foods") or len(search_data["foods"]) == 0:
+                # If no results, fall back to estimated data
+                return self._get_estimated_nutrition_data(food_name)
+            
+            # Get the first food item
+            food_item = search_data["foods"][0]
+            food_id = food_item["fdcId"]
+            
+            # Get detailed nutrition data for the food item
+            detail_params = {
+                "api_key": self.usda_api_key
+            }
+            
+            detail_response = await self._usda_get(f"/fdc/v1/food/{food_id}", detail_params)
+            detail_data = orjson.loads(detail_response.content)
+            
+            # Extract nutrition data
+            nutrients = detail_data.get("foodNutrients", [])
+            
+            calories = protein = carbs = fat = 0.0
+            fiber = sugar = sodium = cholesterol = 0.0
+            detailed_nutrients = [] if include_detailed else None
+            
+            for nutrient in nutrients:
+                nutrient_id = nutrient.get("nutrient", {}).get("id")
+                if nutrient_id in _USDA_NUTRIENT_IDS:
+                    amount = float(nutrient.get("amount", 0))
+                    if nutrient_id == 1008:  # Energy (kcal)
+                        calories = amount
+                    elif nutrient_id == 1003:  # Protein
+                        protein = amount
+                    elif nutrient_id == 1005:  # Carbohydrates
+                        carbs = amount
+                    elif nutrient_id == 1004:  # Total lipid (fat)
+                        fat = amount
+                    elif nutrient_id == 1079:  # Fiber, total dietary
+                        fiber = amount
+                    elif nutrient_id == 2000:  # Sugars, total
+                        sugar = amount
+                    elif nutrient_id == 1093:  # Sodium
+                        sodium = amount
+                    else:  # Cholesterol
+                        cholesterol = amount
+                elif not include_detailed:
+                    # Most nutrients are unmapped and only matter for the breakdown
+                    continue
                 
-                return NutritionData(**nutrition_data)
+                # Add to detailed nutrients
+                if include_detailed and nutrient.get("amount") and nutrient.get("nutrient", {}).get("name"):
+                    detailed_nutrients.append(_RawNutrient(
+                        nutrient["nutrient"]["name"],
+                        float(nutrient["amount"]),
+                        nutrient["nutrient"].get("unitName", "g"),
+                        nutrient.get("percentDailyValue")
+                    ))
+            
+            # Values come from our own aggregation above, so validation is skipped
+            result = NutritionData.model_construct(
+                calories=calories,
+                protein_grams=protein,
+                carbs_grams=carbs,
+                fat_grams=fat,
+                fiber_grams=fiber,
+                sugar_grams=sugar,
+                sodium_mg=sodium,
+                cholesterol_mg=cholesterol,
+                detailed_nutrients=detailed_nutrients
+            )
+            # Only successful lookups are cached; fallbacks are retried next time
+            self._usda_cache[cache_key] = result
+            return result
         
         except Exception as e:
             # If any error occurs, fall back to estimated data
-            print(f"Error in USDA API: {str(e)}")
+            logger.warning("Error in USDA API: %s", e)
             return self._get_estimated_nutrition_data(food_name)
     
-    def _get_estimated_nutrition_data(self, food_name: str) -> NutritionData:
+    @staticmethod
+    @functools.lru_cache(maxsize=2048)
+    def _get_estimated_nutrition_data(food_name: str) -> NutritionData:
         """
         Get estimated nutrition data based on food name.
         This is a fallback when USDA API is not available or fails.
         
+        Results are memoized; NutritionData is frozen, so sharing them is safe.
+        
         Args:
             food_name: The name of the food item
             
@@ -183,68 +404,23 @@ class NutritionService:
         """
         # This is a very basic estimation based on food categories
         # In a real app, this would be more sophisticated
-        food_name_lower = food_name.lower()
-        
-        # Default values
-        calories = 200
-        protein_grams = 10
-        carbs_grams = 20
-        fat_grams = 10
-        
-        # Adjust based on food type
-        if any(word in food_name_lower for word in ["chicken", "beef", "fish", "meat", "turkey", "pork"]):
-            # Protein-rich foods
-            calories = 250
-            protein_grams = 25
-            carbs_grams = 0
-            fat_grams = 15
-        elif any(word in food_name_lower for word in ["salad", "vegetable", "broccoli", "spinach", "kale"]):
-            # Vegetables
-            calories = 50
-            protein_grams = 2
-            carbs_grams = 10
-            fat_grams = 0
-        elif any(word in food_name_lower for word in ["rice", "pasta", "bread", "potato", "grain"]):
-            # Carb-rich foods
-            calories = 200
-            protein_grams = 5
-            carbs_grams = 40
-            fat_grams = 1
-        elif any(word in food_name_lower for word in ["fruit", "apple", "banana", "berry", "orange"]):
-            # Fruits
-            calories = 100
-            protein_grams = 1
-            carbs_grams = 25
-            fat_grams = 0
-        elif any(word in food_name_lower for word in ["yogurt", "milk", "cheese", "dairy"]):
-            # Dairy
-            calories = 150
-            protein_grams = 10
-            carbs_grams = 12
-            fat_grams = 8
-        elif any(word in food_name_lower for word in ["nut", "seed", "almond", "walnut", "peanut"]):
-            # Nuts and seeds
-            calories = 180
-            protein_grams = 6
-            carbs_grams = 6
-            fat_grams = 16
-        elif any(word in food_name_lower for word in ["oil", "butter", "fat"]):
-            # Fats and oils
-            calories = 120
-            protein_grams = 0
-            carbs_grams = 0
-            fat_grams = 14
+        words = frozenset(food_name.lower().translate(_WORD_TRANS).split())
+        return _ESTIMATE_VALUES[min(map(_word_rank, words), default=_DEFAULT_RANK)]
+    
+    @staticmethod
+    @functools.lru_cache(maxsize=2048)
+    def _estimate_macros(food_name: str) -> Tuple[float, float, float, float]:
+        """
+        Get the estimated calories, protein, carbs and fat of a food item.
         
-        return NutritionData(
-            calories=calories,
-            protein_grams=protein_grams,
-            carbs_grams=carbs_grams,
-            fat_grams=fat_grams,
-            fiber_grams=None,
-            sugar_grams=None,
-            sodium_mg=None,
-            cholesterol_mg=None
-        )
+        Args:
+            food_name: The name of the food item
+            
+        Returns:
+            (calories, protein_grams, carbs_grams, fat_grams)
+        """
+        nutrition = NutritionService._get_estimated_nutrition_data(food_name)
+        return (nutrition.calories, nutrition.protein_grams, nutrition.carbs_grams, nutrition.fat_grams)
     
     def calculate_meal_nutrition(self, ingredients: List[str], 
                                  estimated_data: Optional[Dict[str, Any]] = None) -> NutritionData:
@@ -271,22 +447,9 @@ class NutritionService:
                 cholesterol_mg=estimated_data.get("cholesterol_mg")
             )
         
-        # If no estimated data, calculate based on ingredients
-        # This is a very basic calculation
-        total_calories = 0
-        total_protein = 0
-        total_carbs = 0
-        total_fat = 0
-        
-        for ingredient in ingredients:
-            # Get estimated nutrition for each ingredient
-            nutrition = self._get_estimated_nutrition_data(ingredient)
-            
-            # Add to totals
-            total_calories += nutrition.calories
-            total_protein += nutrition.protein_grams
-            total_carbs += nutrition.carbs_grams
-            total_fat += nutrition.fat_grams
+        # If no estimated data, sum the estimated macros of each ingredient
+        totals = [sum(values) for values in zip(*map(self._estimate_macros, ingredients))]
+        total_calories, total_protein, total_carbs, total_fat = totals or (0, 0, 0, 0)
         
         return NutritionData(
             calories=total_calories,
@@ -299,6 +462,44 @@ class NutritionService:
             cholesterol_mg=None
         )
     
+    async def calculate_meal_nutrition_async(self, ingredients: List[str],
+                                             estimated_data: Optional[Dict[str, Any]] = None) -> NutritionData:
+        """
+        Calculate nutrition data for a meal, looking up each ingredient.
+        
+        Ingredients are looked up concurrently (through the USDA API when it is
+        configured) instead of one after another.
+        
+        Args:
+            ingredients: List of ingredients in the meal
+            estimated_data: Estimated nutrition data from OpenAI
+            
+        Returns:
+            Nutrition data for the meal
+        """
+        # If we have estimated data from OpenAI, use it
+        if estimated_data:
+            return self.calculate_meal_nutrition(ingredients, estimated_data)
+        
+        sem = asyncio.Semaphore(_INGREDIENT_CONCURRENCY)
+        
+        async def lookup(ingredient: str) -> NutritionData:
+            async with sem:
+                return await self.get_nutrition_data(ingredient)
+        
+        results = await asyncio.gather(*[lookup(ingredient) for ingredient in ingredients])
+        
+        return NutritionData(
+            calories=sum(result.calories for result in results),
+            protein_grams=sum(result.protein_grams for result in results),
+            carbs_grams=sum(result.carbs_grams for result in results),
+            fat_grams=sum(result.fat_grams for result in results),
+            fiber_grams=None,
+            sugar_grams=None,
+            sodium_mg=None,
+            cholesterol_mg=None
+        )
+    
     def calculate_day_nutrition(self, meals: List[Dict[str, Any]]) -> Dict[str, float]:
         """
         Calculate total nutrition for a day based on all meals.
@@ -309,17 +510,14 @@ class NutritionService:
         Returns:
             Total nutrition data for the day
         """
-        total_calories = 0
-        total_protein = 0
-        total_carbs = 0
-        total_fat = 0
-        
-        for meal in meals:
-            # Add meal nutrition to totals
-            total_calories += meal.get("calories", 0)
-            total_protein += meal.get("protein_grams", 0)
-            total_carbs += meal.get("carbs_grams", 0)
-            total_fat += meal.get("fat_grams", 0)
+        # Sum each macro column at C speed; sum keeps integer totals integers
+        columns = zip(*((
+            meal.get("calories") or 0,
+            meal.get("protein_grams") or 0,
+            meal.get("carbs_grams") or 0,
+            meal.get("fat_grams") or 0
+        ) for meal in meals))
+        total_calories, total_protein, total_carbs, total_fat = [sum(column) for column in columns] or (0, 0, 0, 0)
         
         return {
             "total_calories": total_calories,
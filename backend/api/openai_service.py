@@ -4,70 +4,621 @@ This module handles the interaction with the OpenAI API for meal plan generation
 """
 
 import os
-import json
-from typing import Dict, List, Optional, Any
+import string
+import textwrap
+from collections import Counter
+import copy
+import functools
+import asyncio
+import hashlib
+import httpx
+import importlib.util
+import orjson
+from aiolimiter import AsyncLimiter
+from typing import Any, AsyncIterator, Callable, Dict, Final, List, Optional, Tuple
 from dotenv import load_dotenv
-from openai import OpenAI
-from pydantic import BaseModel, Field
+from openai import AsyncOpenAI, RateLimitError
+from pydantic import BaseModel, ConfigDict, Field, NonNegativeFloat, NonNegativeInt, TypeAdapter
+from typing_extensions import NotRequired, TypedDict
+from tenacity import AsyncRetrying, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
 import logging
-from datetime import datetime, timedelta
+from datetime import date
 
-# Load environment variables
-load_dotenv()
+from .cache import completion_cache_key, create_cache
+from .meal_plan_service import MealPlanService
+
+logger = logging.getLogger(__name__)
+
+_BACKOFF = wait_exponential_jitter(initial=1, max=30)
+
+# HTTP/2 needs the optional h2 package
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+_TEMPERATURE = 0.7
+
+# Identical prompts are answered from the completion cache for a day
+_COMPLETION_CACHE_TTL = 86400
+
+# Generated plans are reused for identical dietary profiles for a day
+_PLAN_CACHE_TTL = 86400
+
+# Plans are generated in concurrent requests of this many days each; output
+# latency grows with the tokens a request generates, so short chunks finish
+# sooner while still sharing the prompt between a couple of days
+_DAYS_PER_REQUEST = 2
+
+_MAX_TOKENS_PER_DAY = 1500
+
+# Shopping list completions are budgeted by the number of items they list
+_SHOPPING_LIST_BASE_TOKENS = 100
+_MAX_TOKENS_PER_ITEM = 60
+
+# Prompts are built once at import; only the user-specific fields are
+# substituted per call. The instructions and response format never change, so
+# they lead in the system message and every request shares the same prefix,
+# which OpenAI's automatic prompt caching serves at a discount. Whitespace is
+# dedented so indentation is not billed as input tokens. The meal plan's JSON
+# layout is enforced by its response format rather than spelled out here
+_MEAL_PLAN_SYSTEM_PROMPT: Final = textwrap.dedent("""\
+    You are a nutritionist and meal planning expert.
+    
+    The meal plan should include breakfast, lunch, dinner, and optional snacks for each day.
+    Each meal should include a name, description, ingredients list, and preparation instructions.
+    Each ingredient is a single string giving the amount needed before the name, e.g. "1 cup rolled oats".
+    Day totals add up the nutrition of the day's meals.
+    """)
+
+_MEAL_PLAN_USER_TEMPLATE: Final = string.Template(textwrap.dedent("""\
+    Generate a meal plan for $days days starting from $start_date and ending on $end_date for a user with the following dietary profile:
+    
+    Goal: $goal
+    Dietary styles: $dietary_styles
+    Allergies: $allergies
+    Preferred cuisines: $preferred_cuisines
+    Daily calorie target: $daily_calorie_target
+    Meal prep time limit: $meal_prep_time_limit minutes
+    
+    Number the first day of this plan $day_number.
+    """))
+
+_SHOPPING_LIST_SYSTEM_PROMPT: Final = textwrap.dedent("""\
+    You are a meal planning assistant that creates organized shopping lists.
+    
+    The shopping list should be organized by category and include the following information:
+    - Item name
+    - Quantity
+    - Unit
+    - Category
+    - Note (optional)
+    
+    The shopping list should be returned as a JSON object with the following structure:
+    {
+        "categories": [
+            {
+                "name": "Produce",
+                "items": [
+                    {
+                        "item_name": "Apples",
+                        "quantity": "4",
+                        "unit": "medium",
+                        "note": "Granny Smith preferred"
+                    },
+                    ...
+                ]
+            },
+            ...
+        ]
+    }
+    
+    Respond with the JSON object only.
+    """)
+
+_SHOPPING_LIST_USER_TEMPLATE: Final = string.Template(textwrap.dedent("""\
+    Generate a shopping list for the ingredients of the following meal plan.
+    Each ingredient is listed once with the number of meals that use it:
+    
+    $ingredients
+    """))
+
+def _ingredient_text(ingredient: Any) -> str:
+    """Render a meal ingredient, given as a string or a name/quantity dict, as one string"""
+    if isinstance(ingredient, dict):
+        return " ".join(filter(None, (ingredient.get("quantity"), ingredient.get("name"))))
+    return ingredient
+
+def _merge_categories(categories: List[Dict[str, Any]], extra: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Add shopping list categories from OpenAI to the locally categorized ones, joining categories by name"""
+    merged = {category["name"].casefold(): category for category in categories}
+    for category in extra:
+        existing = merged.get(category["name"].casefold())
+        if existing is None:
+            merged[category["name"].casefold()] = category
+        else:
+            existing["items"].extend(category.get("items", []))
+    return list(merged.values())
+
+@functools.lru_cache(maxsize=1024)
+def _fmt_list(items: tuple, empty: str) -> str:
+    """Join profile list fields for a prompt, memoized since the same profile is formatted once per day"""
+    return ', '.join(items) if items else empty
+
+def _rate_limit_wait(retry_state) -> float:
+    """Wait for the server's retry-after hint if present, else back off with jitter"""
+    response = getattr(retry_state.outcome.exception(), "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(retry_after)
+    except (TypeError, ValueError):
+        return _BACKOFF(retry_state)
+
+def _retry_rate_limited() -> AsyncRetrying:
+    """Retry a chat completion that was rate limited, up to four attempts"""
+    return AsyncRetrying(
+        stop=stop_after_attempt(4),
+        wait=_rate_limit_wait,
+        retry=retry_if_exception_type(RateLimitError),
+        reraise=True
+    )
+
+def _plan_dates(start: date, days: int) -> List[str]:
+    """ISO dates of each day of a plan starting on the given date"""
+    # Ordinal arithmetic and isoformat skip the timedelta objects and the
+    # strftime format parser
+    first = start.toordinal()
+    return [date.fromordinal(first + day_num).isoformat() for day_num in range(days)]
+
+def _plan_cache_key(dietary_profile: Dict[str, Any], days: int, model: str) -> str:
+    """Hash the model and the fields of a dietary profile that shape a generated plan"""
+    payload = {
+        "m": model,
+        "g": dietary_profile.get("goal_type"),
+        "s": sorted(dietary_profile.get("dietary_styles", [])),
+        "a": sorted(dietary_profile.get("allergies", [])),
+        "c": sorted(dietary_profile.get("preferred_cuisines", [])),
+        "cal": dietary_profile.get("daily_calorie_target"),
+        "p": dietary_profile.get("meal_prep_time_limit"),
+        "d": days
+    }
+    return "mp:" + hashlib.blake2b(orjson.dumps(payload), digest_size=16).hexdigest()
+
+class InfeasibleProfileError(ValueError):
+    """Raised when a meal plan request cannot be satisfied, before any OpenAI call is made"""
+
+class EmptyMealPlanError(ValueError):
+    """Raised when a meal plan has no ingredients to shop for, before any OpenAI call is made"""
+
+# Bounds a dietary profile must fall within to be worth sending to OpenAI
+_MIN_DAILY_CALORIES = 800
+_MAX_DAILY_CALORIES = 6000
+_MAX_PLAN_DAYS = 14
+
+def _precheck_profile(dietary_profile: Dict[str, Any], days: int) -> Optional[str]:
+    """
+    Cheaply check that a meal plan request is feasible.
+    
+    Args:
+        dietary_profile: The dietary profile to plan for
+        days: Number of days for the meal plan
+        
+    Returns:
+        A message describing why the request is infeasible, or None if it is feasible
+    """
+    if not 1 <= days <= _MAX_PLAN_DAYS:
+        return f"Meal plans must be between 1 and {_MAX_PLAN_DAYS} days, got {days}"
+    
+    calories = dietary_profile.get("daily_calorie_target", dietary_profile.get("calories_per_day"))
+    if calories is not None and not _MIN_DAILY_CALORIES <= calories <= _MAX_DAILY_CALORIES:
+        return f"Daily calorie target must be between {_MIN_DAILY_CALORIES} and {_MAX_DAILY_CALORIES}, got {calories}"
+    
+    avoided = {food.casefold() for food in dietary_profile.get("allergies") or ()}
+    avoided.update(food.casefold() for food in dietary_profile.get("excluded_foods") or ())
+    conflicts = sorted(food for food in dietary_profile.get("preferred_foods") or () if food.casefold() in avoided)
+    if conflicts:
+        return f"Preferred foods conflict with allergies or excluded foods: {', '.join(conflicts)}"
+    
+    return None
 
 # Define Pydantic models for structured data
-class Ingredient(BaseModel):
+# Plan models are read-only once validated; unknown fields from OpenAI are dropped
+_MODEL_CONFIG: Final = ConfigDict(frozen=True, extra='ignore')
+
+# Leaf objects are plain dicts rather than models, so they carry no per-instance
+# pydantic state and need no extra layer of model validation
+class Ingredient(TypedDict):
     """Model for a recipe ingredient"""
     name: str
     quantity: str
-    unit: Optional[str] = None
+    unit: NotRequired[Optional[str]]
 
-class NutritionInfo(BaseModel):
+class NutritionInfo(TypedDict, total=False):
     """Model for detailed nutrition information"""
-    fiber_grams: Optional[float] = None
-    sugar_grams: Optional[float] = None
-    sodium_mg: Optional[float] = None
-    cholesterol_mg: Optional[float] = None
-    saturated_fat_grams: Optional[float] = None
-    trans_fat_grams: Optional[float] = None
-    vitamin_a_iu: Optional[float] = None
-    vitamin_c_mg: Optional[float] = None
-    calcium_mg: Optional[float] = None
-    iron_mg: Optional[float] = None
+    fiber_grams: NonNegativeFloat
+    sugar_grams: NonNegativeFloat
+    sodium_mg: NonNegativeFloat
+    cholesterol_mg: NonNegativeFloat
+    saturated_fat_grams: NonNegativeFloat
+    trans_fat_grams: NonNegativeFloat
+    vitamin_a_iu: NonNegativeFloat
+    vitamin_c_mg: NonNegativeFloat
+    calcium_mg: NonNegativeFloat
+    iron_mg: NonNegativeFloat
 
 class Meal(BaseModel):
     """Model for a single meal"""
+    model_config = _MODEL_CONFIG
+    
     name: str
     description: str
     meal_type: str = Field(..., description="One of: breakfast, lunch, dinner, snack")
-    calories: Optional[int] = None
-    protein_grams: Optional[int] = None
-    carbs_grams: Optional[int] = None
-    fat_grams: Optional[int] = None
+    calories: NonNegativeInt
+    protein_grams: NonNegativeInt
+    carbs_grams: NonNegativeInt
+    fat_grams: NonNegativeInt
     ingredients: List[str]
     recipe: str
-    preparation_time_minutes: Optional[int] = None
-    cooking_time_minutes: Optional[int] = None
+    preparation_time_minutes: Optional[NonNegativeInt] = None
+    cooking_time_minutes: Optional[NonNegativeInt] = None
     detailed_nutrition: Optional[NutritionInfo] = None
 
 class DayPlan(BaseModel):
     """Model for a single day's meal plan"""
+    model_config = _MODEL_CONFIG
+    
     day_number: int
     date: Optional[str] = None
     meals: List[Meal]
-    total_calories: Optional[int] = None
-    total_protein_grams: Optional[int] = None
-    total_carbs_grams: Optional[int] = None
-    total_fat_grams: Optional[int] = None
+    total_calories: Optional[NonNegativeInt] = None
+    total_protein_grams: Optional[NonNegativeInt] = None
+    total_carbs_grams: Optional[NonNegativeInt] = None
+    total_fat_grams: Optional[NonNegativeInt] = None
 
 class MealPlan(BaseModel):
     """Model for a complete meal plan"""
+    model_config = _MODEL_CONFIG
+    
     user_id: str
     dietary_profile_id: str
     start_date: Optional[str] = None
     end_date: Optional[str] = None
     days: List[DayPlan]
 
+class _DayPlansResponse(BaseModel):
+    """The object OpenAI returns for a day of the meal plan"""
+    model_config = _MODEL_CONFIG
+    
+    days: List[DayPlan] = []
+
+class ShoppingListEntry(TypedDict):
+    """Model for an item on a generated shopping list"""
+    item_name: str
+    quantity: str
+    unit: NotRequired[Optional[str]]
+    note: NotRequired[Optional[str]]
+
+class ShoppingListCategory(BaseModel):
+    """Model for a category of a generated shopping list"""
+    model_config = _MODEL_CONFIG
+    
+    name: str
+    items: List[ShoppingListEntry]
+
+class _ShoppingListResponse(BaseModel):
+    """The object OpenAI returns for a shopping list"""
+    model_config = _MODEL_CONFIG
+    
+    categories: List[ShoppingListCategory] = []
+
+# Validators are built once at import and reused by every request; each
+# parses and validates a completion in one pass in pydantic-core
+_DAY_PLANS_ADAPTER: Final = TypeAdapter(_DayPlansResponse)
+
+_SHOPPING_LIST_ADAPTER: Final = TypeAdapter(_ShoppingListResponse)
+
+def _strict_json_schema(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Adapt a pydantic JSON schema to OpenAI's strict structured output rules.
+    
+    Every property becomes required (optional fields stay nullable), objects
+    reject unknown properties, and titles and defaults are dropped.
+    
+    Args:
+        schema: A JSON schema produced by pydantic
+        
+    Returns:
+        The schema in strict form
+    """
+    strict = {key: value for key, value in schema.items() if key not in ("title", "default")}
+    if "properties" in strict:
+        strict["properties"] = {name: _strict_json_schema(prop) for name, prop in strict["properties"].items()}
+        strict["required"] = list(strict["properties"])
+        strict["additionalProperties"] = False
+    if "items" in strict:
+        strict["items"] = _strict_json_schema(strict["items"])
+    if "anyOf" in strict:
+        strict["anyOf"] = [_strict_json_schema(option) for option in strict["anyOf"]]
+    if "$defs" in strict:
+        strict["$defs"] = {name: _strict_json_schema(definition) for name, definition in strict["$defs"].items()}
+    return strict
+
+# JSON mode: OpenAI guarantees the completion is a bare JSON object, so
+# parsers decode it without slicing away surrounding prose
+_JSON_OBJECT_RESPONSE_FORMAT: Final = {"type": "json_object"}
+
+# Built once at import; OpenAI constrains day completions to this schema, so
+# well-formed output does not depend on post-decode validation
+_DAY_PLANS_RESPONSE_FORMAT: Final = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "meal_plan_days",
+        "schema": _strict_json_schema(_DayPlansResponse.model_json_schema()),
+        "strict": True
+    }
+}
+
+class _DayStreamParser:
+    """Incrementally picks complete day objects out of a streamed {"days": [...]} completion"""
+    
+    def __init__(self):
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._day: List[str] = []
+    
+    def feed(self, delta: str) -> List[Dict[str, Any]]:
+        """
+        Consume the next piece of the completion.
+        
+        Args:
+            delta: Content received since the previous call
+            
+        Returns:
+            The days whose JSON objects closed within this piece
+        """
+        days = []
+        for char in delta:
+            # Objects nested in the outer object are the days
+            if self._depth >= 2:
+                self._day.append(char)
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._depth += 1
+                if self._depth == 2:
+                    self._day = ["{"]
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 1:
+                    days.append(orjson.loads("".join(self._day)))
+        return days
+
+# Meals and totals shared by every day of a mock meal plan. Built once at
+# import; days reference it rather than copying it, so it must not be mutated
+_MOCK_DAY_BODY: Final = {
+    "meals": [
+        {
+            "name": "Mediterranean Breakfast Bowl",
+            "description": "A nutritious breakfast bowl with Greek yogurt and berries",
+            "meal_type": "breakfast",
+            "calories": 350,
+            "protein_grams": 15,
+            "carbs_grams": 45,
+            "fat_grams": 12,
+            "ingredients": [
+                "1 cup Greek yogurt",
+                "1/2 cup Mixed berries",
+                "1 tbsp Honey",
+                "1/4 cup Granola"
+            ],
+            "recipe": "Mix all ingredients in a bowl and enjoy!",
+            "preparation_time_minutes": 5,
+            "cooking_time_minutes": 0
+        },
+        {
+            "name": "Grilled Chicken Salad",
+            "description": "Fresh salad with grilled chicken and mixed greens",
+            "meal_type": "lunch",
+            "calories": 450,
+            "protein_grams": 35,
+            "carbs_grams": 20,
+            "fat_grams": 25,
+            "ingredients": [
+                "6 oz Chicken breast",
+                "2 cups Mixed greens",
+                "1/2 cup Cherry tomatoes",
+                "1/2 Cucumber",
+                "1 tbsp Olive oil",
+                "1 tbsp Balsamic vinegar"
+            ],
+            "recipe": "1. Grill chicken until cooked through. 2. Chop vegetables. 3. Mix all ingredients and dress with oil and vinegar.",
+            "preparation_time_minutes": 10,
+            "cooking_time_minutes": 15
+        },
+        {
+            "name": "Baked Salmon with Roasted Vegetables",
+            "description": "Oven-baked salmon fillet with seasonal vegetables",
+            "meal_type": "dinner",
+            "calories": 550,
+            "protein_grams": 40,
+            "carbs_grams": 30,
+            "fat_grams": 30,
+            "ingredients": [
+                "6 oz Salmon fillet",
+                "1 cup Broccoli",
+                "1 Bell peppers",
+                "1 tbsp Olive oil",
+                "1/2 Lemon",
+                "2 cloves Garlic"
+            ],
+            "recipe": "1. Preheat oven to 400°F. 2. Season salmon with salt, pepper, and lemon. 3. Chop vegetables and toss with olive oil and garlic. 4. Bake salmon and vegetables for 15-20 minutes.",
+            "preparation_time_minutes": 15,
+            "cooking_time_minutes": 20
+        }
+    ],
+    "total_calories": 1350,
+    "total_protein_grams": 90,
+    "total_carbs_grams": 95,
+    "total_fat_grams": 67
+}
+
+# Meals of the meal plan that shopping lists are generated from in demo mode
+_MOCK_SHOPPING_MEALS: Final = [
+    {
+        "name": "Mediterranean Breakfast Bowl",
+        "meal_type": "breakfast",
+        "ingredients": [
+            "1 cup Greek yogurt",
+            "1 tbsp Honey",
+            "1/2 cup Mixed berries",
+            "1/4 cup Granola"
+        ]
+    },
+    {
+        "name": "Grilled Chicken Salad",
+        "meal_type": "lunch",
+        "ingredients": [
+            "6 oz Chicken breast",
+            "2 cups Mixed greens",
+            "1/2 cup Cherry tomatoes",
+            "1/2 Cucumber",
+            "1 tbsp Olive oil",
+            "1 tbsp Balsamic vinegar"
+        ]
+    },
+    {
+        "name": "Baked Salmon with Roasted Vegetables",
+        "meal_type": "dinner",
+        "ingredients": [
+            "6 oz Salmon fillet",
+            "1 cup Broccoli",
+            "1 Bell peppers",
+            "1 tbsp Olive oil",
+            "1/2 Lemon",
+            "2 cloves Garlic"
+        ]
+    }
+]
+
+# Categorized items of the shopping list returned in mock mode
+_MOCK_SHOPPING_LIST_ITEMS: Final = [
+    {
+        "name": "Produce",
+        "items": [
+            {
+                "item_name": "Mixed berries",
+                "quantity": "1/2",
+                "unit": "cup",
+                "note": "Fresh or frozen"
+            },
+            {
+                "item_name": "Cherry tomatoes",
+                "quantity": "1/2",
+                "unit": "cup",
+                "note": ""
+            },
+            {
+                "item_name": "Cucumber",
+                "quantity": "1",
+                "unit": "medium",
+                "note": ""
+            },
+            {
+                "item_name": "Broccoli",
+                "quantity": "1",
+                "unit": "cup",
+                "note": "Fresh"
+            },
+            {
+                "item_name": "Bell peppers",
+                "quantity": "1",
+                "unit": "medium",
+                "note": "Any color"
+            },
+            {
+                "item_name": "Lemon",
+                "quantity": "1",
+                "unit": "medium",
+                "note": ""
+            },
+            {
+                "item_name": "Garlic",
+                "quantity": "1",
+                "unit": "head",
+                "note": "Need 2 cloves"
+            },
+            {
+                "item_name": "Mixed greens",
+                "quantity": "2",
+                "unit": "cups",
+                "note": "For salad"
+            }
+        ]
+    },
+    {
+        "name": "Dairy",
+        "items": [
+            {
+                "item_name": "Greek yogurt",
+                "quantity": "1",
+                "unit": "cup",
+                "note": "Plain"
+            }
+        ]
+    },
+    {
+        "name": "Meat & Seafood",
+        "items": [
+            {
+                "item_name": "Chicken breast",
+                "quantity": "6",
+                "unit": "oz",
+                "note": ""
+            },
+            {
+                "item_name": "Salmon fillet",
+                "quantity": "6",
+                "unit": "oz",
+                "note": "Fresh"
+            }
+        ]
+    },
+    {
+        "name": "Pantry",
+        "items": [
+            {
+                "item_name": "Honey",
+                "quantity": "1",
+                "unit": "tbsp",
+                "note": ""
+            },
+            {
+                "item_name": "Granola",
+                "quantity": "1/4",
+                "unit": "cup",
+                "note": ""
+            },
+            {
+                "item_name": "Olive oil",
+                "quantity": "3",
+                "unit": "tbsp",
+                "note": "Extra virgin"
+            },
+            {
+                "item_name": "Balsamic vinegar",
+                "quantity": "1",
+                "unit": "tbsp",
+                "note": ""
+            }
+        ]
+    }
+]
+
 class OpenAIService:
     """Service for generating meal plans using OpenAI"""
     
@@ -77,72 +628,244 @@ class OpenAIService:
         api_key = os.getenv("OPENAI_API_KEY")
         
         if not api_key:
-            print("WARNING: OPENAI_API_KEY not found in environment variables. Using mock responses.")
+            logger.warning("OPENAI_API_KEY not found in environment variables; using mock responses")
             self.use_mock = True
         else:
-            print(f"Initializing OpenAI client with API key: {api_key[:5]}...")
+            logger.info("Initializing OpenAI client")
             self.use_mock = False
             try:
-                self.client = OpenAI(api_key=api_key)
-                print("OpenAI client initialized successfully")
+                # Concurrent completions share pooled (HTTP/2 when available)
+                # connections instead of each paying a TCP and TLS handshake.
+                # Idle connections are kept for a few minutes so requests that
+                # arrive between bursts still find one open. Connects fail
+                # fast; reads wait up to a minute between streamed chunks
+                self.client = AsyncOpenAI(
+                    api_key=api_key,
+                    http_client=httpx.AsyncClient(
+                        http2=_HTTP2_AVAILABLE,
+                        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=300),
+                        timeout=httpx.Timeout(60.0, connect=5.0)
+                    )
+                )
+                logger.info("OpenAI client initialized")
             except Exception as e:
-                print(f"Error initializing OpenAI client: {str(e)}")
-                print("Falling back to mock responses")
+                logger.exception("Error initializing OpenAI client, falling back to mock responses")
                 self.use_mock = True
         
         self.model = os.getenv("OPENAI_MODEL", "gpt-4o")
+        
+        # Completions are trusted by default; strict mode validates every day
+        # against the DayPlan schema and is meant for tests and debugging
+        self.strict_validation = os.getenv("OPENAI_STRICT_VALIDATION", "false").lower() == "true"
+        
+        # Caps the number of in-flight chat completions so concurrent requests
+        # (and day chunks fanned out with asyncio.gather) stay within the
+        # account's rate limits
+        self._sem = asyncio.Semaphore(int(os.getenv("OPENAI_MAX_INFLIGHT", "8")))
+        
+        # Token buckets for the account's requests and tokens per minute, so
+        # bursts are spread out client-side instead of being answered with 429s
+        self._rpm_limiter = AsyncLimiter(max_rate=int(os.getenv("OPENAI_MAX_RPM", "500")), time_period=60)
+        self._tpm_limiter = AsyncLimiter(max_rate=int(os.getenv("OPENAI_MAX_TPM", "30000")), time_period=60)
+        
+        # Holds generated plans, keyed by a hash of the model, dietary profile
+        # and plan length, and raw completions, keyed by a hash of the model,
+        # temperature and prompts. Backed by Redis when REDIS_URL is set so
+        # every worker shares it and it survives restarts
+        self._cache = create_cache()
+        
+        # Plan generations in progress, by plan cache key
+        self._pending_plans: Dict[str, asyncio.Future] = {}
+    
+    async def aclose(self) -> None:
+        """Close the OpenAI client's connections. Called on application shutdown."""
+        if not self.use_mock:
+            await self.client.close()
+    
+    def _create_meal_plan_prompt(self, dietary_profile, days, start_date, end_date, day_number=1):
+        return _MEAL_PLAN_USER_TEMPLATE.substitute(
+            days=days,
+            start_date=start_date,
+            end_date=end_date,
+            day_number=day_number,
+            goal=dietary_profile['goal_type'],
+            dietary_styles=_fmt_list(tuple(dietary_profile['dietary_styles']), 'None'),
+            allergies=_fmt_list(tuple(dietary_profile['allergies']), 'None'),
+            preferred_cuisines=_fmt_list(tuple(dietary_profile['preferred_cuisines']), 'None'),
+            daily_calorie_target=dietary_profile['daily_calorie_target'],
+            meal_prep_time_limit=dietary_profile['meal_prep_time_limit']
+        )
     
-    def _create_meal_plan_prompt(self, dietary_profile, days, start_date, end_date):
-        prompt = f"""
-        Generate a meal plan for {days} days starting from {start_date} and ending on {end_date} for a user with the following dietary profile:
+    def _parse_response(self, text: str, adapter: TypeAdapter) -> Dict[str, Any]:
+        """
+        Parse the JSON object in a completion, validating it in strict mode.
         
-        Goal: {dietary_profile['goal_type']}
-        Dietary styles: {', '.join(dietary_profile['dietary_styles'])}
-        Allergies: {', '.join(dietary_profile['allergies'])}
-        Preferred cuisines: {', '.join(dietary_profile['preferred_cuisines'])}
-        Daily calorie target: {dietary_profile['daily_calorie_target']}
-        Meal prep time limit: {dietary_profile['meal_prep_time_limit']} minutes
+        Args:
+            text: The completion content
+            adapter: Validator for the expected response
+            
+        Returns:
+            The parsed object, with only the fields OpenAI returned
+        """
+        if not self.strict_validation:
+            return orjson.loads(text)
+        return adapter.validate_json(text).model_dump(exclude_unset=True)
+    
+    def _parse_day_plans(self, text: str) -> List[Dict[str, Any]]:
+        """
+        Parse the day plans in a completion, validating them in strict mode.
         
-        The meal plan should include breakfast, lunch, dinner, and optional snacks for each day.
-        Each meal should include a name, description, ingredients list, and preparation instructions.
-        The meal plan should be returned as a JSON object with the following structure:
-        {
-            "days": [
-                {
-                    "day_number": 1,
-                    "date": "YYYY-MM-DD",
-                    "meals": [
-                        {
-                            "name": "Meal Name",
-                            "description": "Brief description of the meal",
-                            "meal_type": "breakfast|lunch|dinner|snack",
-                            "calories": 500,
-                            "protein_grams": 20,
-                            "carbs_grams": 50,
-                            "fat_grams": 15,
-                            "ingredients": ["ingredient 1", "ingredient 2", ...],
-                            "recipe": "Step-by-step instructions for preparing the meal",
-                            "preparation_time_minutes": 15,
-                            "cooking_time_minutes": 30
-                        },
-                        ...
-                    ],
-                    "total_calories": 2000,
-                    "total_protein_grams": 100,
-                    "total_carbs_grams": 250,
-                    "total_fat_grams": 70
-                },
-                ...
-            ]
-        }
+        Args:
+            text: The completion content
+            
+        Returns:
+            The day plans, with only the fields OpenAI returned
+        """
+        return self._parse_response(text, _DAY_PLANS_ADAPTER).get("days", [])
+    
+    def _parse_shopping_list(self, text: str) -> Dict[str, Any]:
+        """
+        Parse the shopping list in a completion, validating it in strict mode.
+        
+        Args:
+            text: The completion content
+            
+        Returns:
+            The shopping list object, with only the fields OpenAI returned
+        """
+        return self._parse_response(text, _SHOPPING_LIST_ADAPTER)
+    
+    async def _complete(self, system_prompt: str, prompt: str, max_tokens: int,
+                        parse: Optional[Callable[[str], Any]] = None,
+                        response_format: Optional[Dict[str, Any]] = None,
+                        on_delta: Optional[Callable[[str], None]] = None) -> Any:
+        """
+        Request a chat completion and parse the JSON object it contains.
+        
+        Identical requests are answered from the completion cache. Otherwise the
+        completion is streamed so the content is assembled as it arrives.
+        
+        Args:
+            system_prompt: The system message
+            prompt: The user message
+            max_tokens: Maximum number of tokens to generate
+            parse: Parser for the response content, defaults to plain JSON decoding
+            response_format: Structured output format the completion must follow
+            on_delta: Called with each piece of content as it arrives (or with the
+                whole content when it comes from the cache)
+            
+        Returns:
+            The JSON object parsed from the response
+        """
+        cache_key = completion_cache_key(self.model, _TEMPERATURE, system_prompt, prompt)
+        content = await self._cache.get(cache_key)
+        cached = content is not None
+        
+        if cached and on_delta:
+            on_delta(content)
+        elif not cached:
+            # OpenAI counts max_tokens against the limit up front, plus roughly
+            # one token per four characters of prompt
+            tokens = min(max_tokens + (len(system_prompt) + len(prompt)) // 4, self._tpm_limiter.max_rate)
+            async with self._sem:
+                async for attempt in _retry_rate_limited():
+                    with attempt:
+                        await self._tpm_limiter.acquire(tokens)
+                        await self._rpm_limiter.acquire()
+                        stream = await self.client.chat.completions.create(
+                            model=self.model,
+                            messages=[
+                                {"role": "system", "content": system_prompt},
+                                {"role": "user", "content": prompt}
+                            ],
+                            temperature=_TEMPERATURE,
+                            max_tokens=max_tokens,
+                            stream=True,
+                            **({"response_format": response_format} if response_format else {})
+                        )
+                
+                # Assemble the content as it streams in rather than buffering the whole response
+                parts = []
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        parts.append(chunk.choices[0].delta.content)
+                        if on_delta:
+                            on_delta(chunk.choices[0].delta.content)
+            content = "".join(parts)
+        
+        # Parse off the event loop so other in-flight requests keep progressing
+        parsed = await asyncio.to_thread(parse or orjson.loads, content)
+        
+        # Only cache completions that parsed
+        if not cached:
+            await self._cache.set(cache_key, content, ex=_COMPLETION_CACHE_TTL)
+        
+        return parsed
+    
+    async def _generate_day_chunk(self, prompt: str, days: int = 1,
+                                  on_delta: Optional[Callable[[str], None]] = None) -> List[Dict[str, Any]]:
+        """
+        Request a chunk of consecutive days of the meal plan from OpenAI.
+        
+        Args:
+            prompt: Prompt describing the days to generate
+            days: Number of days the prompt asks for
+            on_delta: Called with each piece of the completion as it streams in
+            
+        Returns:
+            The day plans parsed from the response
+        """
+        return await self._complete(
+            _MEAL_PLAN_SYSTEM_PROMPT, prompt, _MAX_TOKENS_PER_DAY * days,
+            parse=self._parse_day_plans, response_format=_DAY_PLANS_RESPONSE_FORMAT, on_delta=on_delta
+        )
+    
+    def _day_prompts(self, dietary_profile: Dict[str, Any], days: int, start_date_obj: date) -> List[Tuple[str, int]]:
+        """
+        Split the meal plan into chunks of days so the chunks can be generated concurrently.
+        
+        Args:
+            dietary_profile: The dietary profile to plan for
+            days: Number of days for the meal plan
+            start_date_obj: Date of the first day
+            
+        Returns:
+            The prompt for each chunk and the number of days it covers, in order
         """
-        return prompt
+        dates = _plan_dates(start_date_obj, days)
+        prompts = []
+        for first_day in range(0, days, _DAYS_PER_REQUEST):
+            chunk_days = min(_DAYS_PER_REQUEST, days - first_day)
+            prompts.append((self._create_meal_plan_prompt(
+                dietary_profile, chunk_days, dates[first_day], dates[first_day + chunk_days - 1],
+                day_number=first_day + 1
+            ), chunk_days))
+        return prompts
     
-    def _extract_json_from_text(self, text):
-        start_index = text.find('{')
-        end_index = text.rfind('}') + 1
-        json_text = text[start_index:end_index]
-        return json.loads(json_text)
+    async def _generate_plan_days(self, dietary_profile: Dict[str, Any], days: int,
+                                  start_date_obj: date, cache_key: str) -> str:
+        """
+        Generate the days of a meal plan and add them to the plan cache.
+        
+        Args:
+            dietary_profile: The dietary profile to plan for
+            days: Number of days for the meal plan
+            start_date_obj: Date of the first day
+            cache_key: Plan cache key for the profile and plan length
+            
+        Returns:
+            The generated days, serialized as they are cached
+        """
+        # Generate each day's meals using OpenAI
+        prompts = self._day_prompts(dietary_profile, days, start_date_obj)
+        results = await asyncio.gather(*[
+            self._generate_day_chunk(prompt, chunk_days) for prompt, chunk_days in prompts
+        ])
+        
+        # Merge the per-day results
+        plan_days = orjson.dumps([day_plan for day_plans in results for day_plan in day_plans]).decode()
+        await self._cache.set(cache_key, plan_days, ex=_PLAN_CACHE_TTL)
+        return plan_days
     
     def _structure_meal_plan(self, meal_plan_json, user_id, dietary_profile_id, days, start_date, end_date):
         meal_plan = {
@@ -154,6 +877,18 @@ class OpenAIService:
         }
         return meal_plan
     
+    def _mock_dietary_profile(self, user_id: str, dietary_profile_id: str) -> Dict[str, Any]:
+        return {
+            "id": dietary_profile_id,
+            "user_id": user_id,
+            "goal_type": "weight_loss",
+            "dietary_styles": ["mediterranean"],
+            "allergies": ["nuts"],
+            "preferred_cuisines": ["italian", "mexican", "asian"],
+            "daily_calorie_target": 2000,
+            "meal_prep_time_limit": 30
+        }
+    
     async def generate_meal_plan(self, user_id: str, dietary_profile_id: str, days: int, start_date: str, end_date: str) -> Dict[str, Any]:
         """
         Generate a meal plan using OpenAI API.
@@ -169,98 +904,26 @@ class OpenAIService:
             Generated meal plan
         """
         try:
-            print(f"Starting meal plan generation for user_id: {user_id}, dietary_profile_id: {dietary_profile_id}, days: {days}")
+            logger.debug("Starting meal plan generation for user_id=%s dietary_profile_id=%s days=%s", user_id, dietary_profile_id, days)
             
             # For demo purposes, use a mock dietary profile
-            mock_dietary_profile = {
-                "id": dietary_profile_id,
-                "user_id": user_id,
-                "goal_type": "weight_loss",
-                "dietary_styles": ["mediterranean"],
-                "allergies": ["nuts"],
-                "preferred_cuisines": ["italian", "mexican", "asian"],
-                "daily_calorie_target": 2000,
-                "meal_prep_time_limit": 30
-            }
+            mock_dietary_profile = self._mock_dietary_profile(user_id, dietary_profile_id)
+            
+            # Reject infeasible requests before paying for a completion
+            problem = _precheck_profile(mock_dietary_profile, days)
+            if problem:
+                raise InfeasibleProfileError(problem)
             
             # If using mock responses, return a pre-defined meal plan
             if hasattr(self, 'use_mock') and self.use_mock:
-                print("Using mock meal plan response")
+                logger.debug("Using mock meal plan response")
                 
                 # Create a mock meal plan with the specified number of days
-                mock_days = []
-                start_date_obj = datetime.strptime(start_date, "%Y-%m-%d")
-                
-                for day_num in range(days):
-                    current_date = (start_date_obj + timedelta(days=day_num)).strftime("%Y-%m-%d")
-                    mock_days.append({
-                        "day_number": day_num + 1,
-                        "date": current_date,
-                        "meals": [
-                            {
-                                "name": "Mediterranean Breakfast Bowl",
-                                "description": "A nutritious breakfast bowl with Greek yogurt and berries",
-                                "meal_type": "breakfast",
-                                "calories": 350,
-                                "protein_grams": 15,
-                                "carbs_grams": 45,
-                                "fat_grams": 12,
-                                "ingredients": [
-                                    {"name": "Greek yogurt", "quantity": "1 cup"},
-                                    {"name": "Mixed berries", "quantity": "1/2 cup"},
-                                    {"name": "Honey", "quantity": "1 tbsp"},
-                                    {"name": "Granola", "quantity": "1/4 cup"}
-                                ],
-                                "recipe": "Mix all ingredients in a bowl and enjoy!",
-                                "preparation_time_minutes": 5,
-                                "cooking_time_minutes": 0
-                            },
-                            {
-                                "name": "Grilled Chicken Salad",
-                                "description": "Fresh salad with grilled chicken and mixed greens",
-                                "meal_type": "lunch",
-                                "calories": 450,
-                                "protein_grams": 35,
-                                "carbs_grams": 20,
-                                "fat_grams": 25,
-                                "ingredients": [
-                                    {"name": "Chicken breast", "quantity": "6 oz"},
-                                    {"name": "Mixed greens", "quantity": "2 cups"},
-                                    {"name": "Cherry tomatoes", "quantity": "1/2 cup"},
-                                    {"name": "Cucumber", "quantity": "1/2"},
-                                    {"name": "Olive oil", "quantity": "1 tbsp"},
-                                    {"name": "Balsamic vinegar", "quantity": "1 tbsp"}
-                                ],
-                                "recipe": "1. Grill chicken until cooked through. 2. Chop vegetables. 3. Mix all ingredients and dress with oil and vinegar.",
-                                "preparation_time_minutes": 10,
-                                "cooking_time_minutes": 15
-                            },
-                            {
-                                "name": "Baked Salmon with Roasted Vegetables",
-                                "description": "Oven-baked salmon fillet with seasonal vegetables",
-                                "meal_type": "dinner",
-                                "calories": 550,
-                                "protein_grams": 40,
-                                "carbs_grams": 30,
-                                "fat_grams": 30,
-                                "ingredients": [
-                                    {"name": "Salmon fillet", "quantity": "6 oz"},
-                                    {"name": "Broccoli", "quantity": "1 cup"},
-                                    {"name": "Bell peppers", "quantity": "1"},
-                                    {"name": "Olive oil", "quantity": "1 tbsp"},
-                                    {"name": "Lemon", "quantity": "1/2"},
-                                    {"name": "Garlic", "quantity": "2 cloves"}
-                                ],
-                                "recipe": "1. Preheat oven to 400°F. 2. Season salmon with salt, pepper, and lemon. 3. Chop vegetables and toss with olive oil and garlic. 4. Bake salmon and vegetables for 15-20 minutes.",
-                                "preparation_time_minutes": 15,
-                                "cooking_time_minutes": 20
-                            }
-                        ],
-                        "total_calories": 1350,
-                        "total_protein_grams": 90,
-                        "total_carbs_grams": 95,
-                        "total_fat_grams": 67
-                    })
+                dates = _plan_dates(date.fromisoformat(start_date), days)
+                mock_days = [
+                    {"day_number": day_num + 1, "date": day_date, **_MOCK_DAY_BODY}
+                    for day_num, day_date in enumerate(dates)
+                ]
                 
                 return {
                     "user_id": user_id,
@@ -270,70 +933,129 @@ class OpenAIService:
                     "days": mock_days
                 }
             
-            # Create prompt for meal plan generation
-            prompt = self._create_meal_plan_prompt(mock_dietary_profile, days, start_date, end_date)
+            start_date_obj = date.fromisoformat(start_date)
+            cache_key = _plan_cache_key(mock_dietary_profile, days, self.model)
+            cached_plan = await self._cache.get(cache_key)
             
-            # Generate meal plan using OpenAI
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are a nutritionist and meal planning expert."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=4000
-            )
+            if cached_plan is None:
+                # Concurrent requests for the same plan share one generation
+                pending = self._pending_plans.get(cache_key)
+                if pending is None:
+                    pending = asyncio.ensure_future(
+                        self._generate_plan_days(mock_dietary_profile, days, start_date_obj, cache_key)
+                    )
+                    self._pending_plans[cache_key] = pending
+                    pending.add_done_callback(lambda _: self._pending_plans.pop(cache_key, None))
+                # A cancelled request leaves the generation running for the others
+                cached_plan = await asyncio.shield(pending)
             
-            # Parse the response
-            meal_plan_text = response.choices[0].message.content
+            # Each request numbers and dates its own copy of the days
+            plan_days = orjson.loads(cached_plan)
             
-            # Extract JSON from the response
-            meal_plan_json = self._extract_json_from_text(meal_plan_text)
+            # Number the days sequentially and date them from this request's start date
+            meal_plan_json = {"days": plan_days}
+            dates = _plan_dates(start_date_obj, len(plan_days))
+            for day_num, day_plan in enumerate(meal_plan_json["days"]):
+                day_plan["day_number"] = day_num + 1
+                day_plan["date"] = dates[day_num]
             
             # Validate and structure the meal plan
             meal_plan = self._structure_meal_plan(meal_plan_json, user_id, dietary_profile_id, days, start_date, end_date)
             
             return meal_plan
             
+        except InfeasibleProfileError:
+            raise
         except Exception as e:
-            logging.error(f"Error generating meal plan: {str(e)}")
-            import traceback
-            logging.error(f"Traceback: {traceback.format_exc()}")
+            logger.exception("generate_meal_plan failed", extra={"model": self.model, "days": days})
             raise Exception(f"Failed to generate meal plan: {str(e)}")
     
-    def _create_shopping_list_prompt(self, meal_plan):
-        prompt = f"""
-        Generate a shopping list for the following meal plan:
-        
-        {json.dumps(meal_plan, indent=2)}
+    async def generate_meal_plan_stream(self, user_id: str, dietary_profile_id: str, days: int, start_date: str, end_date: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Generate a meal plan using OpenAI API, yielding each day as it is ready.
         
-        The shopping list should be organized by category and include the following information:
-        - Item name
-        - Quantity
-        - Unit
-        - Category
-        - Note (optional)
+        Chunks of days are requested concurrently and parsed as they stream in;
+        each day is yielded as soon as its JSON object has closed and every
+        earlier day has been yielded, so clients can render the plan
+        progressively.
         
-        The shopping list should be returned as a JSON object with the following structure:
-        {
-            "categories": [
-                {
-                    "name": "Produce",
-                    "items": [
-                        {
-                            "item_name": "Apples",
-                            "quantity": "4",
-                            "unit": "medium",
-                            "note": "Granny Smith preferred"
-                        },
-                        ...
-                    ]
-                },
-                ...
-            ]
-        }
+        Args:
+            user_id: User ID
+            dietary_profile_id: Dietary profile ID
+            days: Number of days for the meal plan
+            start_date: Start date for the meal plan
+            end_date: End date for the meal plan
+            
+        Yields:
+            The days of the generated meal plan, in order
         """
-        return prompt
+        mock_dietary_profile = self._mock_dietary_profile(user_id, dietary_profile_id)
+        problem = _precheck_profile(mock_dietary_profile, days)
+        if problem:
+            raise InfeasibleProfileError(problem)
+        cache_key = _plan_cache_key(mock_dietary_profile, days, self.model)
+        
+        # Mock and previously generated plans are available immediately
+        if self.use_mock or await self._cache.get(cache_key) is not None:
+            meal_plan = await self.generate_meal_plan(user_id, dietary_profile_id, days, start_date, end_date)
+            for day_plan in meal_plan["days"]:
+                yield day_plan
+            return
+        
+        start_date_obj = date.fromisoformat(start_date)
+        first_ordinal = start_date_obj.toordinal()
+        prompts = self._day_prompts(mock_dietary_profile, days, start_date_obj)
+        tasks = []
+        queues = []
+        for prompt, chunk_days in prompts:
+            # Days are queued as soon as the parser sees their object close; a
+            # None marks the end of the chunk
+            queue: asyncio.Queue = asyncio.Queue()
+            parser = _DayStreamParser()
+            
+            def on_delta(delta: str, parser=parser, queue=queue) -> None:
+                for day_plan in parser.feed(delta):
+                    queue.put_nowait(day_plan)
+            
+            task = asyncio.create_task(self._generate_day_chunk(prompt, chunk_days, on_delta=on_delta))
+            task.add_done_callback(lambda _, queue=queue: queue.put_nowait(None))
+            tasks.append(task)
+            queues.append(queue)
+        
+        try:
+            generated_days = []
+            for task, queue in zip(tasks, queues):
+                while (day_plan := await queue.get()) is not None:
+                    day_plan["day_number"] = len(generated_days) + 1
+                    day_plan["date"] = date.fromordinal(first_ordinal + len(generated_days)).isoformat()
+                    generated_days.append(copy.deepcopy(day_plan))
+                    yield day_plan
+                # Surface a failed chunk (and strict validation errors) once its days are out
+                await task
+            
+            await self._cache.set(cache_key, orjson.dumps(generated_days).decode(), ex=_PLAN_CACHE_TTL)
+        finally:
+            # Stop outstanding requests if the consumer goes away early
+            for task in tasks:
+                task.cancel()
+    
+    def _count_ingredients(self, meal_plan) -> Counter:
+        # Repeated ingredients are handled once with a count instead of once
+        # per meal, which cuts the prompt's input tokens and spares the model
+        # the deduplication
+        return Counter(
+            _ingredient_text(ingredient)
+            for day in meal_plan["days"]
+            for meal in day["meals"]
+            for ingredient in meal.get("ingredients", [])
+        )
+    
+    def _create_shopping_list_prompt(self, counts: Dict[str, int]):
+        return _SHOPPING_LIST_USER_TEMPLATE.substitute(
+            ingredients=orjson.dumps(
+                [{"ingredient": ingredient, "occurrences": occurrences} for ingredient, occurrences in counts.items()]
+            ).decode()
+        )
     
     def _structure_shopping_list(self, shopping_list_json, user_id, meal_plan_id):
         shopping_list = {
@@ -355,7 +1077,7 @@ class OpenAIService:
             Generated shopping list
         """
         try:
-            print(f"Starting shopping list generation for user_id: {user_id}, meal_plan_id: {meal_plan_id}")
+            logger.debug("Starting shopping list generation for user_id=%s meal_plan_id=%s", user_id, meal_plan_id)
             
             # For demo purposes, create a mock meal plan
             mock_meal_plan = {
@@ -363,205 +1085,61 @@ class OpenAIService:
                 "user_id": user_id,
                 "days": [
                     {
-                        "date": datetime.now().strftime("%Y-%m-%d"),
-                        "meals": [
-                            {
-                                "name": "Mediterranean Breakfast Bowl",
-                                "meal_type": "breakfast",
-                                "ingredients": [
-                                    {"name": "Greek yogurt", "quantity": "1 cup"},
-                                    {"name": "Honey", "quantity": "1 tbsp"},
-                                    {"name": "Mixed berries", "quantity": "1/2 cup"},
-                                    {"name": "Granola", "quantity": "1/4 cup"}
-                                ]
-                            },
-                            {
-                                "name": "Grilled Chicken Salad",
-                                "meal_type": "lunch",
-                                "ingredients": [
-                                    {"name": "Chicken breast", "quantity": "6 oz"},
-                                    {"name": "Mixed greens", "quantity": "2 cups"},
-                                    {"name": "Cherry tomatoes", "quantity": "1/2 cup"},
-                                    {"name": "Cucumber", "quantity": "1/2"},
-                                    {"name": "Olive oil", "quantity": "1 tbsp"},
-                                    {"name": "Balsamic vinegar", "quantity": "1 tbsp"}
-                                ]
-                            },
-                            {
-                                "name": "Baked Salmon with Roasted Vegetables",
-                                "meal_type": "dinner",
-                                "ingredients": [
-                                    {"name": "Salmon fillet", "quantity": "6 oz"},
-                                    {"name": "Broccoli", "quantity": "1 cup"},
-                                    {"name": "Bell peppers", "quantity": "1"},
-                                    {"name": "Olive oil", "quantity": "1 tbsp"},
-                                    {"name": "Lemon", "quantity": "1/2"},
-                                    {"name": "Garlic", "quantity": "2 cloves"}
-                                ]
-                            }
-                        ]
+                        "date": date.today().isoformat(),
+                        "meals": _MOCK_SHOPPING_MEALS
                     }
                 ]
             }
             
-            print(f"Created mock meal plan: {mock_meal_plan}")
+            logger.debug("Created mock meal plan: %s", mock_meal_plan)
             
             # If using mock responses, return a pre-defined shopping list
             if hasattr(self, 'use_mock') and self.use_mock:
-                print("Using mock shopping list response")
+                logger.debug("Using mock shopping list response")
                 return {
                     "user_id": user_id,
                     "meal_plan_id": meal_plan_id,
-                    "items": [
-                        {
-                            "name": "Produce",
-                            "items": [
-                                {
-                                    "item_name": "Mixed berries",
-                                    "quantity": "1/2",
-                                    "unit": "cup",
-                                    "note": "Fresh or frozen"
-                                },
-                                {
-                                    "item_name": "Cherry tomatoes",
-                                    "quantity": "1/2",
-                                    "unit": "cup",
-                                    "note": ""
-                                },
-                                {
-                                    "item_name": "Cucumber",
-                                    "quantity": "1",
-                                    "unit": "medium",
-                                    "note": ""
-                                },
-                                {
-                                    "item_name": "Broccoli",
-                                    "quantity": "1",
-                                    "unit": "cup",
-                                    "note": "Fresh"
-                                },
-                                {
-                                    "item_name": "Bell peppers",
-                                    "quantity": "1",
-                                    "unit": "medium",
-                                    "note": "Any color"
-                                },
-                                {
-                                    "item_name": "Lemon",
-                                    "quantity": "1",
-                                    "unit": "medium",
-                                    "note": ""
-                                },
-                                {
-                                    "item_name": "Garlic",
-                                    "quantity": "1",
-                                    "unit": "head",
-                                    "note": "Need 2 cloves"
-                                },
-                                {
-                                    "item_name": "Mixed greens",
-                                    "quantity": "2",
-                                    "unit": "cups",
-                                    "note": "For salad"
-                                }
-                            ]
-                        },
-                        {
-                            "name": "Dairy",
-                            "items": [
-                                {
-                                    "item_name": "Greek yogurt",
-                                    "quantity": "1",
-                                    "unit": "cup",
-                                    "note": "Plain"
-                                }
-                            ]
-                        },
-                        {
-                            "name": "Meat & Seafood",
-                            "items": [
-                                {
-                                    "item_name": "Chicken breast",
-                                    "quantity": "6",
-                                    "unit": "oz",
-                                    "note": ""
-                                },
-                                {
-                                    "item_name": "Salmon fillet",
-                                    "quantity": "6",
-                                    "unit": "oz",
-                                    "note": "Fresh"
-                                }
-                            ]
-                        },
-                        {
-                            "name": "Pantry",
-                            "items": [
-                                {
-                                    "item_name": "Honey",
-                                    "quantity": "1",
-                                    "unit": "tbsp",
-                                    "note": ""
-                                },
-                                {
-                                    "item_name": "Granola",
-                                    "quantity": "1/4",
-                                    "unit": "cup",
-                                    "note": ""
-                                },
-                                {
-                                    "item_name": "Olive oil",
-                                    "quantity": "3",
-                                    "unit": "tbsp",
-                                    "note": "Extra virgin"
-                                },
-                                {
-                                    "item_name": "Balsamic vinegar",
-                                    "quantity": "1",
-                                    "unit": "tbsp",
-                                    "note": ""
-                                }
-                            ]
-                        }
-                    ]
+                    "items": _MOCK_SHOPPING_LIST_ITEMS
                 }
             
-            # Create prompt for shopping list generation
-            prompt = self._create_shopping_list_prompt(mock_meal_plan)
+            # Categorize what the local keyword table recognizes; only the rest
+            # needs OpenAI
+            counts = self._count_ingredients(mock_meal_plan)
+            if not counts:
+                raise EmptyMealPlanError(f"Meal plan {meal_plan_id} has no ingredients to shop for")
+            categories, unmatched = MealPlanService.categorize_ingredients(counts)
             
-            print(f"Created prompt for OpenAI: {prompt[:200]}...")
-            
-            # Generate shopping list using OpenAI
-            print(f"Calling OpenAI API with model: {self.model}")
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are a meal planning assistant that creates organized shopping lists."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=2000
-            )
-            
-            # Parse the response
-            shopping_list_text = response.choices[0].message.content
-            print(f"Received response from OpenAI: {shopping_list_text[:200]}...")
-            
-            # Extract JSON from the response
-            shopping_list_json = self._extract_json_from_text(shopping_list_text)
-            print(f"Extracted JSON: {shopping_list_json}")
+            if unmatched:
+                # Create prompt for shopping list generation
+                prompt = self._create_shopping_list_prompt({ingredient: counts[ingredient] for ingredient in unmatched})
+                
+                logger.debug("Created prompt for OpenAI: %.200s...", prompt)
+                
+                # Generate shopping list using OpenAI
+                logger.debug("Calling OpenAI API with model: %s", self.model)
+                shopping_list_json = await self._complete(
+                    _SHOPPING_LIST_SYSTEM_PROMPT, prompt,
+                    _SHOPPING_LIST_BASE_TOKENS + _MAX_TOKENS_PER_ITEM * len(unmatched),
+                    parse=self._parse_shopping_list, response_format=_JSON_OBJECT_RESPONSE_FORMAT
+                )
+                logger.debug("Extracted JSON: %s", shopping_list_json)
+                categories = _merge_categories(categories, shopping_list_json.get("categories", []))
             
             # Validate and structure the shopping list
-            shopping_list = self._structure_shopping_list(shopping_list_json, user_id, meal_plan_id)
-            print(f"Structured shopping list: {shopping_list}")
+            shopping_list = self._structure_shopping_list({"categories": categories}, user_id, meal_plan_id)
+            logger.debug("Structured shopping list: %s", shopping_list)
             
             return shopping_list
             
+        except EmptyMealPlanError:
+            raise
         except Exception as e:
-            logging.error(f"Error generating shopping list: {str(e)}")
-            import traceback
-            logging.error(f"Traceback: {traceback.format_exc()}")
+            logger.exception("generate_shopping_list failed", extra={"model": self.model, "meal_plan_id": meal_plan_id})
             raise Exception(f"Failed to generate shopping list: {str(e)}")
 
-# Create a singleton instance
-openai_service = OpenAIService()
+@functools.lru_cache(maxsize=1)
+def get_openai_service() -> OpenAIService:
+    """Return the shared OpenAIService, creating it on first use"""
+    # Read .env only once the service is needed rather than on import
+    load_dotenv()
+    return OpenAIService()
@@ -1,16 +1,23 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List, Optional, Dict, Any
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from typing import AsyncIterator, List, Optional, Dict, Any
 from pydantic import BaseModel
 import os
-from datetime import datetime, timedelta
-from .openai_service import OpenAIService
+from datetime import date, datetime, timedelta, timezone
+from .openai_service import get_openai_service, EmptyMealPlanError, InfeasibleProfileError
 from .supabase_service import SupabaseService, MealPlan, ShoppingList
 from .nutrition_service import NutritionService, NutritionData
 from fastapi import Request
 import uuid
+from itertools import chain
+import hashlib
+import logging
+import orjson
 
-router = APIRouter()
-openai_service = OpenAIService()
+logger = logging.getLogger(__name__)
+
+# Handlers return ORJSONResponse even when the router is mounted outside app.py
+router = APIRouter(default_response_class=ORJSONResponse)
 supabase_service = SupabaseService()
 nutrition_service = NutritionService()
 
@@ -44,6 +51,25 @@ class ShoppingListResponse(BaseModel):
     meal_plan_id: str
     items: List[Dict[str, Any]]
 
+class ItemPatch(BaseModel):
+    item_id: uuid.UUID
+    is_purchased: bool
+
+class ShoppingListItemsUpdateResponse(BaseModel):
+    shopping_list_id: str
+    updated: int
+
+class MealPlanIngredientsResponse(BaseModel):
+    meal_plan_id: str
+    ingredients: List[Any]
+
+class GoalsSubmissionResponse(BaseModel):
+    success: bool
+    message: str
+    user_id: str
+    dietary_profile_id: str
+    meal_plan_id: str
+
 class NutritionResponse(BaseModel):
     calories: float
     protein_grams: float
@@ -86,7 +112,7 @@ async def get_meal_plans():
     # This is a placeholder - actual implementation will use Supabase
     return {"message": "This endpoint will return meal plans"}
 
-@router.post("/meal-plans/generate", response_model=Dict[str, Any])
+@router.post("/meal-plans/generate")
 async def generate_meal_plan(meal_plan_request: Dict[str, Any]):
     """
     Generate a meal plan based on dietary profile.
@@ -102,11 +128,12 @@ async def generate_meal_plan(meal_plan_request: Dict[str, Any]):
         user_id = meal_plan_request.get("user_id", "test-user-id")
         dietary_profile_id = meal_plan_request.get("dietary_profile_id", "test-profile-id")
         days = meal_plan_request.get("days", 1)
-        start_date = meal_plan_request.get("start_date", datetime.now().strftime("%Y-%m-%d"))
-        end_date = meal_plan_request.get("end_date", (datetime.now() + timedelta(days=days-1)).strftime("%Y-%m-%d"))
+        today = date.today()
+        start_date = meal_plan_request.get("start_date", today.isoformat())
+        end_date = meal_plan_request.get("end_date", (today + timedelta(days=days-1)).isoformat())
         
         # Generate meal plan using OpenAI
-        meal_plan = await openai_service.generate_meal_plan(
+        meal_plan = await get_openai_service().generate_meal_plan(
             user_id=user_id,
             dietary_profile_id=dietary_profile_id,
             days=days,
@@ -117,17 +144,144 @@ async def generate_meal_plan(meal_plan_request: Dict[str, Any]):
         # For demo purposes, add an ID to the meal plan
         meal_plan["id"] = str(uuid.uuid4())
         
-        # Return the meal plan directly without saving to database
-        return meal_plan
+        # Return the meal plan directly without saving to database; a ready
+        # Response skips FastAPI's jsonable_encoder walk over the whole plan
+        return ORJSONResponse(meal_plan)
+        
+    except InfeasibleProfileError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.exception(
+            "generate_meal_plan failed",
+            extra={
+                "user_id": meal_plan_request.get("user_id"),
+                "profile_id": meal_plan_request.get("dietary_profile_id")
+            }
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to generate meal plan: {str(e)}"
+        )
+
+def _sse_event(event: str, data: Any) -> bytes:
+    """Encode a server-sent event with a JSON payload"""
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
+async def _meal_plan_events(meal_plan: Dict[str, Any], first_day: Optional[Dict[str, Any]],
+                            days_stream: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[bytes]:
+    """
+    Stream a meal plan as server-sent events.
+    
+    A "plan" event carries the plan's fields, each "day" event one day in
+    order, and a final "done" or "error" event ends the stream.
+    
+    Args:
+        meal_plan: The meal plan's fields other than its days
+        first_day: The first day, already received from the stream
+        days_stream: The remaining days
+    """
+    yield _sse_event("plan", meal_plan)
+    try:
+        if first_day is not None:
+            yield _sse_event("day", first_day)
+        async for day_plan in days_stream:
+            yield _sse_event("day", day_plan)
+    except Exception as e:
+        # The response has already started, so the failure is reported in band
+        logger.exception("stream_meal_plan failed", extra={"user_id": meal_plan["user_id"]})
+        yield _sse_event("error", {"detail": f"Failed to generate meal plan: {str(e)}"})
+        return
+    finally:
+        # Stops outstanding OpenAI requests if the client disconnects
+        await days_stream.aclose()
+    yield _sse_event("done", {"id": meal_plan["id"]})
+
+@router.post("/meal-plans/generate/stream")
+async def stream_meal_plan(meal_plan_request: Dict[str, Any]):
+    """
+    Generate a meal plan, streaming each day to the client as it is ready.
+    
+    Args:
+        meal_plan_request: Request containing user_id, dietary_profile_id, days, start_date, and end_date
         
+    Returns:
+        A text/event-stream response of the meal plan's days
+    """
+    user_id = meal_plan_request.get("user_id", "test-user-id")
+    dietary_profile_id = meal_plan_request.get("dietary_profile_id", "test-profile-id")
+    days = meal_plan_request.get("days", 1)
+    today = date.today()
+    start_date = meal_plan_request.get("start_date", today.isoformat())
+    end_date = meal_plan_request.get("end_date", (today + timedelta(days=days-1)).isoformat())
+    
+    days_stream = get_openai_service().generate_meal_plan_stream(
+        user_id=user_id,
+        dietary_profile_id=dietary_profile_id,
+        days=days,
+        start_date=start_date,
+        end_date=end_date
+    )
+    
+    # Wait for the first day so rejected requests and failures to start still
+    # get a proper status code
+    try:
+        first_day = await days_stream.__anext__()
+    except StopAsyncIteration:
+        first_day = None
+    except InfeasibleProfileError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
+        )
     except Exception as e:
+        logger.exception(
+            "stream_meal_plan failed",
+            extra={"user_id": user_id, "profile_id": dietary_profile_id}
+        )
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to generate meal plan: {str(e)}"
         )
+    
+    # For demo purposes, give the meal plan an ID; like the non-streaming
+    # endpoint, it is not saved to the database
+    meal_plan = {
+        "id": str(uuid.uuid4()),
+        "user_id": user_id,
+        "dietary_profile_id": dietary_profile_id,
+        "start_date": start_date,
+        "end_date": end_date
+    }
+    return StreamingResponse(
+        _meal_plan_events(meal_plan, first_day, days_stream),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+def _conditional_json(request: Request, payload: Any) -> Response:
+    """
+    Serialize a payload with an ETag and answer a matching If-None-Match with 304.
+    
+    Args:
+        request: The incoming request carrying any If-None-Match header
+        payload: The JSON-serializable response body
+        
+    Returns:
+        A 304 response when the client's copy is current, otherwise the JSON body
+    """
+    body = orjson.dumps(payload)
+    etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in (tag.strip() for tag in if_none_match.split(",")) or if_none_match.strip() == "*":
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @router.get("/meal-plans/{meal_plan_id}")
-async def get_meal_plan(meal_plan_id: str):
+async def get_meal_plan(meal_plan_id: str, request: Request):
     """
     Get a specific meal plan by ID
     
@@ -135,7 +289,7 @@ async def get_meal_plan(meal_plan_id: str):
         meal_plan_id: The ID of the meal plan to retrieve
         
     Returns:
-        The meal plan with all related data
+        The meal plan with all related data, or 304 if the client's ETag still matches
     """
     try:
         meal_plan = await supabase_service.get_meal_plan(meal_plan_id)
@@ -146,7 +300,7 @@ async def get_meal_plan(meal_plan_id: str):
                 detail=f"Meal plan with ID {meal_plan_id} not found"
             )
         
-        return meal_plan
+        return _conditional_json(request, meal_plan)
     except HTTPException:
         raise
     except Exception as e:
@@ -155,7 +309,7 @@ async def get_meal_plan(meal_plan_id: str):
             detail=f"Failed to retrieve meal plan: {str(e)}"
         )
 
-@router.get("/meal-plans/{meal_plan_id}/ingredients")
+@router.get("/meal-plans/{meal_plan_id}/ingredients", response_model=MealPlanIngredientsResponse)
 async def get_meal_plan_ingredients(meal_plan_id: str):
     """
     Get all ingredients from a meal plan
@@ -177,11 +331,11 @@ async def get_meal_plan_ingredients(meal_plan_id: str):
             )
         
         # Extract all ingredients from the meal plan
-        all_ingredients = []
-        for day in meal_plan.get("days", []):
-            for meal in day.get("meals", []):
-                if "ingredients" in meal and meal["ingredients"]:
-                    all_ingredients.extend(meal["ingredients"])
+        all_ingredients = list(chain.from_iterable(
+            meal.get("ingredients") or []
+            for day in meal_plan.get("days", [])
+            for meal in day.get("meals", [])
+        ))
         
         return {"meal_plan_id": meal_plan_id, "ingredients": all_ingredients}
     except HTTPException:
@@ -205,7 +359,7 @@ async def calculate_nutrition(request: NutritionRequest):
     """
     try:
         # Calculate nutrition data for the meal
-        nutrition_data = await nutrition_service.calculate_meal_nutrition(
+        nutrition_data = await nutrition_service.calculate_meal_nutrition_async(
             request.ingredients,
             request.estimated_data
         )
@@ -271,7 +425,7 @@ async def get_shopping_lists():
     # This is a placeholder - actual implementation will use Supabase
     return {"message": "This endpoint will return shopping lists"}
 
-@router.post("/shopping-lists/generate", response_model=Dict[str, Any])
+@router.post("/shopping-lists/generate")
 async def generate_shopping_list(request: Dict[str, Any]):
     """
     Generate a shopping list from a meal plan.
@@ -283,40 +437,45 @@ async def generate_shopping_list(request: Dict[str, Any]):
         The generated shopping list
     """
     try:
-        print(f"Received shopping list request: {request}")
+        logger.debug("Received shopping list request: %s", request)
         
         # Extract meal plan ID from request
         meal_plan_id = request.get("meal_plan_id", "test-meal-plan-id")
         user_id = request.get("user_id", "test-user-id")
         
-        print(f"Generating shopping list for meal_plan_id: {meal_plan_id}, user_id: {user_id}")
+        logger.debug("Generating shopping list for meal_plan_id=%s user_id=%s", meal_plan_id, user_id)
         
         # Generate shopping list using OpenAI
-        shopping_list = await openai_service.generate_shopping_list(
+        shopping_list = await get_openai_service().generate_shopping_list(
             user_id=user_id,
             meal_plan_id=meal_plan_id
         )
         
-        print(f"Generated shopping list: {shopping_list}")
+        logger.debug("Generated shopping list: %s", shopping_list)
         
         # For demo purposes, add an ID to the shopping list
         shopping_list["id"] = str(uuid.uuid4())
         
         # Return the shopping list directly without saving to database
-        return shopping_list
+        return ORJSONResponse(shopping_list)
         
+    except EmptyMealPlanError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
+        )
     except Exception as e:
-        print(f"Error generating shopping list: {str(e)}")
-        print(f"Error type: {type(e)}")
-        import traceback
-        print(f"Traceback: {traceback.format_exc()}")
+        logger.exception(
+            "generate_shopping_list failed",
+            extra={"user_id": request.get("user_id"), "meal_plan_id": request.get("meal_plan_id")}
+        )
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to generate shopping list: {str(e)}"
         )
 
 @router.get("/shopping-lists/{shopping_list_id}")
-async def get_shopping_list(shopping_list_id: str):
+async def get_shopping_list(shopping_list_id: str, request: Request):
     """
     Get a specific shopping list by ID
     
@@ -324,7 +483,7 @@ async def get_shopping_list(shopping_list_id: str):
         shopping_list_id: The ID of the shopping list to retrieve
         
     Returns:
-        The shopping list with all items
+        The shopping list with all items, or 304 if the client's ETag still matches
     """
     try:
         shopping_list = await supabase_service.get_shopping_list(shopping_list_id)
@@ -335,7 +494,7 @@ async def get_shopping_list(shopping_list_id: str):
                 detail=f"Shopping list with ID {shopping_list_id} not found"
             )
         
-        return shopping_list
+        return _conditional_json(request, shopping_list)
     except HTTPException:
         raise
     except Exception as e:
@@ -344,7 +503,32 @@ async def get_shopping_list(shopping_list_id: str):
             detail=f"Failed to retrieve shopping list: {str(e)}"
         )
 
-@router.post("/goals", response_model=Dict[str, Any])
+@router.patch("/shopping-lists/{shopping_list_id}/items", response_model=ShoppingListItemsUpdateResponse)
+async def update_shopping_list_items(shopping_list_id: str, patches: List[ItemPatch]):
+    """
+    Mark many shopping list items purchased or unpurchased in one request
+    
+    Args:
+        shopping_list_id: The ID of the shopping list the items belong to
+        patches: The items to update and their new purchased state
+        
+    Returns:
+        The number of items updated
+    """
+    try:
+        updated = await supabase_service.update_shopping_list_items(
+            shopping_list_id,
+            [patch.model_dump(mode="json") for patch in patches]
+        )
+        
+        return {"shopping_list_id": shopping_list_id, "updated": updated}
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to update shopping list items: {str(e)}"
+        )
+
+@router.post("/goals", response_model=GoalsSubmissionResponse)
 async def submit_goals(request: Dict[str, Any]):
     """
     Submit user dietary goals and generate a meal plan.
@@ -356,7 +540,7 @@ async def submit_goals(request: Dict[str, Any]):
         Generated meal plan ID
     """
     try:
-        print(f"Received goals submission: {request}")
+        logger.debug("Received goals submission: %s", request)
         
         # For demo purposes, create a mock user and dietary profile
         user_id = str(uuid.uuid4())
@@ -366,11 +550,12 @@ async def submit_goals(request: Dict[str, Any]):
         days = request.get("days", 7)
         
         # Generate start and end dates
-        start_date = datetime.now().strftime("%Y-%m-%d")
-        end_date = (datetime.now() + timedelta(days=days - 1)).strftime("%Y-%m-%d")
+        today = date.today()
+        start_date = today.isoformat()
+        end_date = (today + timedelta(days=days - 1)).isoformat()
         
         # Generate meal plan using OpenAI
-        meal_plan = await openai_service.generate_meal_plan(
+        meal_plan = await get_openai_service().generate_meal_plan(
             user_id=user_id,
             dietary_profile_id=dietary_profile_id,
             days=days,
@@ -390,18 +575,20 @@ async def submit_goals(request: Dict[str, Any]):
             "meal_plan_id": meal_plan_id
         }
         
+    except InfeasibleProfileError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
+        )
     except Exception as e:
-        print(f"Error submitting goals: {str(e)}")
-        print(f"Error type: {type(e)}")
-        import traceback
-        print(f"Traceback: {traceback.format_exc()}")
+        logger.exception("submit_goals failed")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to submit goals: {str(e)}"
         )
 
 # Testing endpoints for development and demo purposes
-@router.get("/test/shopping-list", response_model=Dict[str, Any])
+@router.get("/test/shopping-list", include_in_schema=False)
 async def test_shopping_list():
     """
     Generate a test shopping list for demonstration purposes.
@@ -413,7 +600,7 @@ async def test_shopping_list():
             "id": str(uuid.uuid4()),
             "user_id": "test-user-id",
             "meal_plan_id": "test-meal-plan-id",
-            "created_at": datetime.now().isoformat(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
             "items": [
                 {
                     "id": str(uuid.uuid4()),
@@ -515,23 +702,25 @@ async def test_shopping_list():
             detail=f"Failed to generate test shopping list: {str(e)}"
         )
 
-@router.post("/test/shopping-list", response_model=Dict[str, Any])
+@router.post("/test/shopping-list", include_in_schema=False)
 async def test_generate_shopping_list(request: Request):
     """
     Generate a shopping list for testing purposes.
     This endpoint bypasses database checks and is intended for development and demos only.
     """
     try:
-        # Create OpenAI service
-        openai_service = OpenAIService()
-        
         # Generate a sample shopping list
-        shopping_list = await openai_service.generate_shopping_list(
+        shopping_list = await get_openai_service().generate_shopping_list(
             user_id="test-user-id",
             meal_plan_id="test-meal-plan-id"
         )
         
         return shopping_list
+    except EmptyMealPlanError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -3,12 +3,118 @@ Supabase service for interacting with the database.
 Handles CRUD operations for meal plans, meals, and shopping lists.
 """
 import os
-import json
 import uuid
-from datetime import datetime
+import asyncio
+import logging
+import importlib.util
+from itertools import islice
+from datetime import datetime, timezone
 from typing import Dict, List, Optional, Any, Union
 import httpx
+import orjson
+from cachetools import TTLCache
 from pydantic import BaseModel
+from .cache import create_cache
+
+try:
+    import asyncpg
+except ImportError:  # asyncpg is optional; without it every read goes through PostgREST
+    asyncpg = None
+
+logger = logging.getLogger(__name__)
+
+# Shared HTTP client so PostgREST calls reuse pooled keep-alive connections
+# instead of paying a TCP + TLS handshake per request. The pool is kept small
+# and fully kept alive: PostgREST multiplexes requests onto its own database
+# pool, so more sockets per worker only adds contention
+_HTTP_CLIENT: Optional[httpx.AsyncClient] = None
+_HTTP_CLIENT_LOCK = asyncio.Lock()
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+async def _get_client() -> httpx.AsyncClient:
+    """Return the process-wide HTTP client, creating it on first use."""
+    global _HTTP_CLIENT
+    if _HTTP_CLIENT is None:
+        async with _HTTP_CLIENT_LOCK:
+            if _HTTP_CLIENT is None:
+                _HTTP_CLIENT = httpx.AsyncClient(
+                    http2=_HTTP2_AVAILABLE,
+                    timeout=10.0,
+                    limits=httpx.Limits(max_connections=20, max_keepalive_connections=20)
+                )
+    return _HTTP_CLIENT
+
+async def close_http_client() -> None:
+    """Close the shared HTTP client. Called on application shutdown."""
+    global _HTTP_CLIENT
+    if _HTTP_CLIENT is not None:
+        await _HTTP_CLIENT.aclose()
+        _HTTP_CLIENT = None
+
+# Direct Postgres pool for hot read paths, skipping the PostgREST hop. Only
+# created when SUPABASE_DB_URL is set; writes always stay on PostgREST
+_DB_POOL: Optional["asyncpg.Pool"] = None
+_DB_POOL_LOCK = asyncio.Lock()
+_DB_POOL_UNAVAILABLE = False
+
+async def _get_db_pool() -> Optional["asyncpg.Pool"]:
+    """Return the process-wide Postgres pool, or None when direct reads are not configured."""
+    global _DB_POOL, _DB_POOL_UNAVAILABLE
+    if _DB_POOL is not None or _DB_POOL_UNAVAILABLE:
+        return _DB_POOL
+    dsn = os.environ.get("SUPABASE_DB_URL")
+    if not dsn:
+        return None
+    async with _DB_POOL_LOCK:
+        if _DB_POOL is None and not _DB_POOL_UNAVAILABLE:
+            if asyncpg is None:
+                logger.warning("SUPABASE_DB_URL is set but asyncpg is not installed; reading through PostgREST")
+                _DB_POOL_UNAVAILABLE = True
+            else:
+                try:
+                    _DB_POOL = await asyncpg.create_pool(
+                        dsn=dsn, min_size=5, max_size=20, statement_cache_size=100
+                    )
+                except Exception:
+                    logger.exception("Could not connect to SUPABASE_DB_URL; reading through PostgREST")
+                    _DB_POOL_UNAVAILABLE = True
+    return _DB_POOL
+
+async def close_db_pool() -> None:
+    """Close the shared Postgres pool. Called on application shutdown."""
+    global _DB_POOL
+    if _DB_POOL is not None:
+        await _DB_POOL.close()
+        _DB_POOL = None
+
+# Builds the same shape as the PostgREST embed "*,items:shopping_list_items(*)"
+# in one round trip, returned as JSON text for orjson to parse
+_SHOPPING_LIST_SQL = """
+SELECT (to_jsonb(sl) || jsonb_build_object('items', COALESCE(
+    (SELECT jsonb_agg(i ORDER BY i.created_at) FROM public.shopping_list_items i
+     WHERE i.shopping_list_id = sl.id),
+    '[]'::jsonb)))::text
+FROM public.shopping_lists sl
+WHERE sl.id = $1::uuid
+"""
+
+def _bulk_uuids(n: int) -> List[str]:
+    """Generate n random UUID4 strings from a single OS random draw."""
+    raw = os.urandom(16 * n)
+    return [str(uuid.UUID(bytes=raw[i:i + 16], version=4)) for i in range(0, 16 * n, 16)]
+
+# Maximum rows sent in a single PostgREST bulk insert
+_BULK_INSERT_CHUNK_SIZE = 500
+
+# Saved meal plans rarely change, so repeat reads are served from memory
+_MEAL_PLAN_CACHE: TTLCache = TTLCache(maxsize=10_000, ttl=300)
+
+# Shopping lists are cached more briefly, since items get checked off as
+# they are purchased. They live in the shared cache backend so a write
+# invalidates them for every worker; without REDIS_URL the cache is per
+# process, and other workers may serve a list checked off elsewhere until
+# this TTL runs out
+_SHOPPING_LIST_CACHE_TTL = 60
 
 class MealItem(BaseModel):
     name: str
@@ -65,6 +171,10 @@ class SupabaseService:
             "Content-Type": "application/json",
             "Prefer": "return=representation"
         }
+        self._shopping_list_cache = create_cache()
+        # Meal plan fetches in progress, by meal plan ID, so concurrent reads
+        # of the same plan share one request
+        self._inflight_meal_plans: Dict[str, asyncio.Task] = {}
         
     async def save_meal_plan(self, meal_plan: MealPlan) -> Dict[str, Any]:
         """
@@ -87,72 +197,57 @@ class SupabaseService:
                 "dietary_profile_id": meal_plan.dietary_profile_id,
                 "start_date": meal_plan.start_date,
                 "end_date": meal_plan.end_date,
-                "created_at": datetime.now().isoformat()
+                "created_at": datetime.now(timezone.utc).isoformat()
             }
             
-            async with httpx.AsyncClient() as client:
-                # Insert the meal plan
-                meal_plan_response = await client.post(
-                    f"{self.supabase_url}/rest/v1/meal_plans",
-                    headers=self.headers,
-                    json=meal_plan_data
-                )
-                
-                if meal_plan_response.status_code != 201:
-                    raise Exception(f"Failed to save meal plan: {meal_plan_response.text}")
-                
-                # Save each day and its meals
-                for day in meal_plan.days:
-                    day_data = {
-                        "id": str(uuid.uuid4()),
-                        "meal_plan_id": meal_plan_id,
-                        "day_number": day.day_number,
-                        "date": day.date,
-                        "total_calories": day.total_calories,
-                        "total_protein_grams": day.total_protein_grams,
-                        "total_carbs_grams": day.total_carbs_grams,
-                        "total_fat_grams": day.total_fat_grams
+            client = await _get_client()
+            
+            # Insert the meal plan
+            meal_plan_response = await client.post(
+                f"{self.supabase_url}/rest/v1/meal_plans",
+                headers=self.headers,
+                json=meal_plan_data
+            )
+            
+            if meal_plan_response.status_code != 201:
+                raise Exception(f"Failed to save meal plan: {meal_plan_response.text}")
+            
+            # Days and meals are keyed by locally generated IDs, so each table
+            # is written with a single bulk insert once its parent rows exist
+            day_rows = []
+            meal_rows = []
+            for day_id, day in zip(_bulk_uuids(len(meal_plan.days)), meal_plan.days):
+                day_rows.append({
+                    "id": day_id,
+                    "meal_plan_id": meal_plan_id,
+                    "day_number": day.day_number,
+                    "date": day.date,
+                    "total_calories": day.total_calories,
+                    "total_protein_grams": day.total_protein_grams,
+                    "total_carbs_grams": day.total_carbs_grams,
+                    "total_fat_grams": day.total_fat_grams
+                })
+                meal_rows.extend(
+                    {
+                        "id": meal_id,
+                        "day_id": day_id,
+                        "name": meal.name,
+                        "description": meal.description,
+                        "meal_type": meal.meal_type,
+                        "calories": meal.calories,
+                        "protein_grams": meal.protein_grams,
+                        "carbs_grams": meal.carbs_grams,
+                        "fat_grams": meal.fat_grams,
+                        "ingredients": orjson.dumps(meal.ingredients).decode(),
+                        "recipe": meal.recipe,
+                        "preparation_time_minutes": meal.preparation_time_minutes,
+                        "cooking_time_minutes": meal.cooking_time_minutes
                     }
-                    
-                    # Insert the day
-                    day_response = await client.post(
-                        f"{self.supabase_url}/rest/v1/days",
-                        headers=self.headers,
-                        json=day_data
-                    )
-                    
-                    if day_response.status_code != 201:
-                        raise Exception(f"Failed to save day: {day_response.text}")
-                    
-                    day_id = day_response.json()[0]["id"]
-                    
-                    # Save each meal
-                    for meal in day.meals:
-                        meal_data = {
-                            "id": str(uuid.uuid4()),
-                            "day_id": day_id,
-                            "name": meal.name,
-                            "description": meal.description,
-                            "meal_type": meal.meal_type,
-                            "calories": meal.calories,
-                            "protein_grams": meal.protein_grams,
-                            "carbs_grams": meal.carbs_grams,
-                            "fat_grams": meal.fat_grams,
-                            "ingredients": json.dumps(meal.ingredients),
-                            "recipe": meal.recipe,
-                            "preparation_time_minutes": meal.preparation_time_minutes,
-                            "cooking_time_minutes": meal.cooking_time_minutes
-                        }
-                        
-                        # Insert the meal
-                        meal_response = await client.post(
-                            f"{self.supabase_url}/rest/v1/meals",
-                            headers=self.headers,
-                            json=meal_data
-                        )
-                        
-                        if meal_response.status_code != 201:
-                            raise Exception(f"Failed to save meal: {meal_response.text}")
+                    for meal_id, meal in zip(_bulk_uuids(len(day.meals)), day.meals)
+                )
+            
+            await self._bulk_insert(client, "days", day_rows, "days")
+            await self._bulk_insert(client, "meals", meal_rows, "meals")
             
             # Return the meal plan with the database ID
             return {"id": meal_plan_id, **meal_plan.model_dump()}
@@ -160,6 +255,32 @@ class SupabaseService:
         except Exception as e:
             raise Exception(f"Error saving meal plan: {str(e)}")
     
+    async def _bulk_insert(self, client: httpx.AsyncClient, table: str, rows: List[Dict[str, Any]], label: str) -> None:
+        """
+        Insert rows into a table with as few requests as possible.
+        
+        Rows are sent as JSON arrays of up to _BULK_INSERT_CHUNK_SIZE rows so each
+        request stays within PostgREST's request size limits, and the inserted
+        rows are not echoed back.
+        
+        Args:
+            client: The HTTP client to use
+            table: The table to insert into
+            rows: The records to insert
+            label: Name of the records used in error messages
+        """
+        headers = {**self.headers, "Prefer": "return=minimal"}
+        rows_iter = iter(rows)
+        while chunk := list(islice(rows_iter, _BULK_INSERT_CHUNK_SIZE)):
+            response = await client.post(
+                f"{self.supabase_url}/rest/v1/{table}",
+                headers=headers,
+                json=chunk
+            )
+            
+            if response.status_code != 201:
+                raise Exception(f"Failed to save {label}: {response.text}")
+    
     async def save_shopping_list(self, shopping_list: ShoppingList) -> Dict[str, Any]:
         """
         Save a shopping list to the database.
@@ -179,24 +300,28 @@ class SupabaseService:
                 "id": shopping_list_id,
                 "user_id": shopping_list.user_id,
                 "meal_plan_id": shopping_list.meal_plan_id,
-                "created_at": datetime.now().isoformat()
+                "created_at": datetime.now(timezone.utc).isoformat()
             }
             
-            async with httpx.AsyncClient() as client:
-                # Insert the shopping list
-                shopping_list_response = await client.post(
-                    f"{self.supabase_url}/rest/v1/shopping_lists",
-                    headers=self.headers,
-                    json=shopping_list_data
-                )
-                
-                if shopping_list_response.status_code != 201:
-                    raise Exception(f"Failed to save shopping list: {shopping_list_response.text}")
-                
-                # Save each shopping list item
-                for item in shopping_list.items:
-                    item_data = {
-                        "id": str(uuid.uuid4()),
+            client = await _get_client()
+            
+            # Insert the shopping list
+            shopping_list_response = await client.post(
+                f"{self.supabase_url}/rest/v1/shopping_lists",
+                headers=self.headers,
+                json=shopping_list_data
+            )
+            
+            if shopping_list_response.status_code != 201:
+                raise Exception(f"Failed to save shopping list: {shopping_list_response.text}")
+            
+            # Save the shopping list items in bulk
+            await self._bulk_insert(
+                client,
+                "shopping_list_items",
+                [
+                    {
+                        "id": item_id,
                         "shopping_list_id": shopping_list_id,
                         "item_name": item.item_name,
                         "quantity": item.quantity,
@@ -205,16 +330,10 @@ class SupabaseService:
                         "note": item.note,
                         "is_purchased": item.is_purchased
                     }
-                    
-                    # Insert the item
-                    item_response = await client.post(
-                        f"{self.supabase_url}/rest/v1/shopping_list_items",
-                        headers=self.headers,
-                        json=item_data
-                    )
-                    
-                    if item_response.status_code != 201:
-                        raise Exception(f"Failed to save shopping list item: {item_response.text}")
+                    for item_id, item in zip(_bulk_uuids(len(shopping_list.items)), shopping_list.items)
+                ],
+                "shopping list items"
+            )
             
             # Return the shopping list with the database ID
             return {"id": shopping_list_id, **shopping_list.model_dump()}
@@ -222,10 +341,67 @@ class SupabaseService:
         except Exception as e:
             raise Exception(f"Error saving shopping list: {str(e)}")
     
+    async def update_shopping_list_items(self, shopping_list_id: str, patches: List[Dict[str, Any]]) -> int:
+        """
+        Update the purchased state of many shopping list items at once.
+        
+        The patches are applied by the bulk_update_items database function in
+        a single statement, so the whole batch costs one round trip.
+        
+        Args:
+            shopping_list_id: The ID of the shopping list the items belong to
+            patches: Dicts with item_id and is_purchased
+            
+        Returns:
+            The number of items updated
+        """
+        try:
+            client = await _get_client()
+            
+            response = await client.post(
+                f"{self.supabase_url}/rest/v1/rpc/bulk_update_items",
+                headers=self.headers,
+                json={"list_id": shopping_list_id, "patches": patches}
+            )
+            
+            if response.status_code != 200:
+                raise Exception(f"Failed to update shopping list items: {response.text}")
+            
+            # The cached copy no longer reflects what was checked off
+            await self._shopping_list_cache.delete(f"shopping_list:{shopping_list_id}")
+            return response.json()
+        
+        except Exception as e:
+            raise Exception(f"Error updating shopping list items: {str(e)}")
+    
     async def get_meal_plan(self, meal_plan_id: str) -> Optional[Dict[str, Any]]:
         """
         Get a meal plan from the database.
         
+        Args:
+            meal_plan_id: The ID of the meal plan to retrieve
+            
+        Returns:
+            The meal plan with all related data, or None if not found
+        """
+        cached_meal_plan = _MEAL_PLAN_CACHE.get(meal_plan_id)
+        if cached_meal_plan is not None:
+            return cached_meal_plan
+        
+        task = self._inflight_meal_plans.get(meal_plan_id)
+        if task is None:
+            task = asyncio.create_task(self._fetch_meal_plan(meal_plan_id))
+            self._inflight_meal_plans[meal_plan_id] = task
+            task.add_done_callback(lambda _: self._inflight_meal_plans.pop(meal_plan_id, None))
+        
+        # Shielded so one caller being cancelled does not cancel the fetch
+        # the other callers are waiting on
+        return await asyncio.shield(task)
+    
+    async def _fetch_meal_plan(self, meal_plan_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Fetch a meal plan from Supabase and add it to the cache.
+        
         Args:
             meal_plan_id: The ID of the meal plan to retrieve
             
@@ -233,55 +409,37 @@ class SupabaseService:
             The meal plan with all related data, or None if not found
         """
         try:
-            async with httpx.AsyncClient() as client:
-                # Get the meal plan
-                meal_plan_response = await client.get(
-                    f"{self.supabase_url}/rest/v1/meal_plans?id=eq.{meal_plan_id}",
-                    headers=self.headers
-                )
-                
-                if meal_plan_response.status_code != 200:
-                    raise Exception(f"Failed to get meal plan: {meal_plan_response.text}")
-                
-                meal_plans = meal_plan_response.json()
-                if not meal_plans:
-                    return None
-                
-                meal_plan = meal_plans[0]
-                
-                # Get the days for this meal plan
-                days_response = await client.get(
-                    f"{self.supabase_url}/rest/v1/days?meal_plan_id=eq.{meal_plan_id}",
-                    headers=self.headers
-                )
-                
-                if days_response.status_code != 200:
-                    raise Exception(f"Failed to get days: {days_response.text}")
-                
-                days = days_response.json()
-                meal_plan["days"] = []
-                
-                for day in days:
-                    # Get the meals for this day
-                    meals_response = await client.get(
-                        f"{self.supabase_url}/rest/v1/meals?day_id=eq.{day['id']}",
-                        headers=self.headers
-                    )
-                    
-                    if meals_response.status_code != 200:
-                        raise Exception(f"Failed to get meals: {meals_response.text}")
-                    
-                    meals = meals_response.json()
-                    
-                    # Parse ingredients from JSON string to list
-                    for meal in meals:
-                        if "ingredients" in meal and meal["ingredients"]:
-                            meal["ingredients"] = json.loads(meal["ingredients"])
-                    
-                    day["meals"] = meals
-                    meal_plan["days"].append(day)
-                
-                return meal_plan
+            client = await _get_client()
+            
+            # Get the meal plan with its days and their meals embedded, in one
+            # request and one query instead of one per day
+            meal_plan_response = await client.get(
+                f"{self.supabase_url}/rest/v1/meal_plans",
+                headers=self.headers,
+                params={
+                    "id": f"eq.{meal_plan_id}",
+                    "select": "*,days(*,meals(*))",
+                    "days.order": "day_number"
+                }
+            )
+            
+            if meal_plan_response.status_code != 200:
+                raise Exception(f"Failed to get meal plan: {meal_plan_response.text}")
+            
+            meal_plans = meal_plan_response.json()
+            if not meal_plans:
+                return None
+            
+            meal_plan = meal_plans[0]
+            
+            # Parse ingredients from JSON string to list
+            for day in meal_plan["days"]:
+                for meal in day["meals"]:
+                    if "ingredients" in meal and meal["ingredients"]:
+                        meal["ingredients"] = orjson.loads(meal["ingredients"])
+            
+            _MEAL_PLAN_CACHE[meal_plan_id] = meal_plan
+            return meal_plan
         
         except Exception as e:
             raise Exception(f"Error getting meal plan: {str(e)}")
@@ -296,36 +454,43 @@ class SupabaseService:
         Returns:
             The shopping list with all items, or None if not found
         """
+        cache_key = f"shopping_list:{shopping_list_id}"
+        cached_shopping_list = await self._shopping_list_cache.get(cache_key)
+        if cached_shopping_list is not None:
+            return orjson.loads(cached_shopping_list)
+        
         try:
-            async with httpx.AsyncClient() as client:
-                # Get the shopping list
-                shopping_list_response = await client.get(
-                    f"{self.supabase_url}/rest/v1/shopping_lists?id=eq.{shopping_list_id}",
-                    headers=self.headers
-                )
-                
-                if shopping_list_response.status_code != 200:
-                    raise Exception(f"Failed to get shopping list: {shopping_list_response.text}")
-                
-                shopping_lists = shopping_list_response.json()
-                if not shopping_lists:
+            pool = await _get_db_pool()
+            if pool is not None:
+                row = await pool.fetchval(_SHOPPING_LIST_SQL, shopping_list_id)
+                if row is None:
                     return None
                 
-                shopping_list = shopping_lists[0]
-                
-                # Get the items for this shopping list
-                items_response = await client.get(
-                    f"{self.supabase_url}/rest/v1/shopping_list_items?shopping_list_id=eq.{shopping_list_id}",
-                    headers=self.headers
-                )
-                
-                if items_response.status_code != 200:
-                    raise Exception(f"Failed to get shopping list items: {items_response.text}")
-                
-                items = items_response.json()
-                shopping_list["items"] = items
-                
-                return shopping_list
+                await self._shopping_list_cache.set(cache_key, row, ex=_SHOPPING_LIST_CACHE_TTL)
+                return orjson.loads(row)
+            
+            client = await _get_client()
+            
+            # Get the shopping list with its items embedded
+            shopping_list_response = await client.get(
+                f"{self.supabase_url}/rest/v1/shopping_lists",
+                headers=self.headers,
+                params={"id": f"eq.{shopping_list_id}", "select": "*,items:shopping_list_items(*)"}
+            )
+            
+            if shopping_list_response.status_code != 200:
+                raise Exception(f"Failed to get shopping list: {shopping_list_response.text}")
+            
+            shopping_lists = shopping_list_response.json()
+            if not shopping_lists:
+                return None
+            
+            shopping_list = shopping_lists[0]
+            
+            await self._shopping_list_cache.set(
+                cache_key, orjson.dumps(shopping_list).decode(), ex=_SHOPPING_LIST_CACHE_TTL
+            )
+            return shopping_list
         
         except Exception as e:
             raise Exception(f"Error getting shopping list: {str(e)}")
@@ -1,9 +1,16 @@
 from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import os
+import asyncio
+import logging
+import logging.handlers
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -14,6 +21,8 @@ app = FastAPI(
     title="HungryJack API",
     description="API for HungryJack AI Meal Planner",
     version="0.1.0",
+    # Responses are serialized with orjson rather than the stdlib json module
+    default_response_class=ORJSONResponse,
 )
 
 # Add CORS middleware
@@ -25,6 +34,42 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-request timing, logged with the matched route template so latency
+# percentiles can be aggregated per endpoint. Written as plain ASGI middleware
+# so streamed responses are timed until their last chunk is sent
+timing_logger = logging.getLogger("hungryjack.timing")
+
+class RequestTimingMiddleware:
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        start = time.perf_counter_ns()
+        status_code = 500
+        
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration_ns = time.perf_counter_ns() - start
+            route = scope.get("route")
+            path = getattr(route, "path", scope["path"])
+            timing_logger.info(
+                "%s %s %d %.1fms", scope["method"], path, status_code, duration_ns / 1e6,
+                extra={"route": path, "method": scope["method"], "status": status_code, "duration_ns": duration_ns}
+            )
+
+app.add_middleware(RequestTimingMiddleware)
+
 # Import API router
 try:
     from api.router import router as api_router
@@ -42,16 +87,41 @@ except ImportError:
 # Add error handlers
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
-    return {"detail": exc.detail, "status_code": exc.status_code}
+    return ORJSONResponse({"detail": exc.detail, "status_code": exc.status_code}, status_code=exc.status_code)
 
 @app.exception_handler(Exception)
 async def general_exception_handler(request, exc):
-    return {"detail": str(exc), "status_code": status.HTTP_500_INTERNAL_SERVER_ERROR}
+    return ORJSONResponse(
+        {"detail": str(exc), "status_code": status.HTTP_500_INTERNAL_SERVER_ERROR},
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
+    )
+
+# Log records are handed to a queue and written by a listener thread, so
+# logging from request handlers never blocks the event loop on stream I/O
+_log_listener: Optional[logging.handlers.QueueListener] = None
+
+def _start_log_listener() -> None:
+    global _log_listener
+    log_queue = queue.SimpleQueue()
+    root_logger = logging.getLogger()
+    output_handlers = root_logger.handlers[:] or [logging.StreamHandler()]
+    for handler in root_logger.handlers[:]:
+        root_logger.removeHandler(handler)
+    root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    _log_listener = logging.handlers.QueueListener(
+        log_queue, *output_handlers, respect_handler_level=True
+    )
+    _log_listener.start()
 
 # Startup and shutdown events
 @app.on_event("startup")
 async def startup_event():
     print("Starting up HungryJack API...")
+    _start_log_listener()
+    # Size the pool used by asyncio.to_thread for CPU-bound parsing work
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4))
+    )
     # Check if required environment variables are set
     required_env_vars = [
         "SUPABASE_URL",
@@ -67,6 +137,22 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     print("Shutting down HungryJack API...")
+    # Release pooled HTTP connections held by the services
+    from api.supabase_service import close_http_client, close_db_pool
+    await close_http_client()
+    await close_db_pool()
+    try:
+        from api.router import nutrition_service
+        await nutrition_service.aclose()
+    except ImportError:
+        pass
+    from api.openai_service import get_openai_service
+    # Only close the OpenAI client if a request ever created the service
+    if get_openai_service.cache_info().currsize:
+        await get_openai_service().aclose()
+    # Flush any queued log records
+    if _log_listener is not None:
+        _log_listener.stop()
 
 # Run the application
 if __name__ == "__main__":
@@ -88,67 +88,81 @@ ALTER TABLE public.shopping_lists ENABLE ROW LEVEL SECURITY;
 ALTER TABLE public.shopping_list_items ENABLE ROW LEVEL SECURITY;
 
 -- Create policies for profiles table
+DROP POLICY IF EXISTS "Users can view their own profile" ON public.profiles;
 CREATE POLICY "Users can view their own profile" 
   ON public.profiles FOR SELECT 
   USING (auth.uid() = id);
 
+DROP POLICY IF EXISTS "Users can update their own profile" ON public.profiles;
 CREATE POLICY "Users can update their own profile" 
   ON public.profiles FOR UPDATE 
   USING (auth.uid() = id);
 
 -- Create policies for dietary_profiles table
+DROP POLICY IF EXISTS "Users can view their own dietary profiles" ON public.dietary_profiles;
 CREATE POLICY "Users can view their own dietary profiles" 
   ON public.dietary_profiles FOR SELECT 
   USING (auth.uid() = user_id);
 
+DROP POLICY IF EXISTS "Users can create their own dietary profiles" ON public.dietary_profiles;
 CREATE POLICY "Users can create their own dietary profiles" 
   ON public.dietary_profiles FOR INSERT 
   WITH CHECK (auth.uid() = user_id);
 
+DROP POLICY IF EXISTS "Users can update their own dietary profiles" ON public.dietary_profiles;
 CREATE POLICY "Users can update their own dietary profiles" 
   ON public.dietary_profiles FOR UPDATE 
   USING (auth.uid() = user_id);
 
+DROP POLICY IF EXISTS "Users can delete their own dietary profiles" ON public.dietary_profiles;
 CREATE POLICY "Users can delete their own dietary profiles" 
   ON public.dietary_profiles FOR DELETE 
   USING (auth.uid() = user_id);
 
 -- Create policies for meal_plans table
+DROP POLICY IF EXISTS "Users can view their own meal plans" ON public.meal_plans;
 CREATE POLICY "Users can view their own meal plans" 
   ON public.meal_plans FOR SELECT 
   USING (auth.uid() = user_id);
 
+DROP POLICY IF EXISTS "Users can create their own meal plans" ON public.meal_plans;
 CREATE POLICY "Users can create their own meal plans" 
   ON public.meal_plans FOR INSERT 
   WITH CHECK (auth.uid() = user_id);
 
+DROP POLICY IF EXISTS "Users can update their own meal plans" ON public.meal_plans;
 CREATE POLICY "Users can update their own meal plans" 
   ON public.meal_plans FOR UPDATE 
   USING (auth.uid() = user_id);
 
+DROP POLICY IF EXISTS "Users can delete their own meal plans" ON public.meal_plans;
 CREATE POLICY "Users can delete their own meal plans" 
   ON public.meal_plans FOR DELETE 
   USING (auth.uid() = user_id);
 
 -- Create policies for meals table
+DROP POLICY IF EXISTS "Users can view their own meals" ON public.meals;
 CREATE POLICY "Users can view their own meals" 
   ON public.meals FOR SELECT 
   USING (auth.uid() IN (
     SELECT user_id FROM public.meal_plans WHERE id = meal_plan_id
   ));
 
+DROP POLICY IF EXISTS "Users can create meals for their own meal plans" ON public.meals;
 CREATE POLICY "Users can create meals for their own meal plans" 
   ON public.meals FOR INSERT 
   WITH CHECK (auth.uid() IN (
     SELECT user_id FROM public.meal_plans WHERE id = meal_plan_id
   ));
 
+DROP POLICY IF EXISTS "Users can update their own meals" ON public.meals;
 CREATE POLICY "Users can update their own meals" 
   ON public.meals FOR UPDATE 
   USING (auth.uid() IN (
     SELECT user_id FROM public.meal_plans WHERE id = meal_plan_id
   ));
 
+DROP POLICY IF EXISTS "Users can delete their own meals" ON public.meals;
 CREATE POLICY "Users can delete their own meals" 
   ON public.meals FOR DELETE 
   USING (auth.uid() IN (
@@ -156,41 +170,49 @@ CREATE POLICY "Users can delete their own meals"
   ));
 
 -- Create policies for shopping_lists table
+DROP POLICY IF EXISTS "Users can view their own shopping lists" ON public.shopping_lists;
 CREATE POLICY "Users can view their own shopping lists" 
   ON public.shopping_lists FOR SELECT 
   USING (auth.uid() = user_id);
 
+DROP POLICY IF EXISTS "Users can create their own shopping lists" ON public.shopping_lists;
 CREATE POLICY "Users can create their own shopping lists" 
   ON public.shopping_lists FOR INSERT 
   WITH CHECK (auth.uid() = user_id);
 
+DROP POLICY IF EXISTS "Users can update their own shopping lists" ON public.shopping_lists;
 CREATE POLICY "Users can update their own shopping lists" 
   ON public.shopping_lists FOR UPDATE 
   USING (auth.uid() = user_id);
 
+DROP POLICY IF EXISTS "Users can delete their own shopping lists" ON public.shopping_lists;
 CREATE POLICY "Users can delete their own shopping lists" 
   ON public.shopping_lists FOR DELETE 
   USING (auth.uid() = user_id);
 
 -- Create policies for shopping_list_items table
+DROP POLICY IF EXISTS "Users can view their own shopping list items" ON public.shopping_list_items;
 CREATE POLICY "Users can view their own shopping list items" 
   ON public.shopping_list_items FOR SELECT 
   USING (auth.uid() IN (
     SELECT user_id FROM public.shopping_lists WHERE id = shopping_list_id
   ));
 
+DROP POLICY IF EXISTS "Users can create items for their own shopping lists" ON public.shopping_list_items;
 CREATE POLICY "Users can create items for their own shopping lists" 
   ON public.shopping_list_items FOR INSERT 
   WITH CHECK (auth.uid() IN (
     SELECT user_id FROM public.shopping_lists WHERE id = shopping_list_id
   ));
 
+DROP POLICY IF EXISTS "Users can update their own shopping list items" ON public.shopping_list_items;
 CREATE POLICY "Users can update their own shopping list items" 
   ON public.shopping_list_items FOR UPDATE 
   USING (auth.uid() IN (
     SELECT user_id FROM public.shopping_lists WHERE id = shopping_list_id
   ));
 
+DROP POLICY IF EXISTS "Users can delete their own shopping list items" ON public.shopping_list_items;
 CREATE POLICY "Users can delete their own shopping list items" 
   ON public.shopping_list_items FOR DELETE 
   USING (auth.uid() IN (
@@ -206,26 +228,32 @@ BEGIN
 END;
 $$ LANGUAGE plpgsql;
 
+DROP TRIGGER IF EXISTS update_profiles_modtime ON public.profiles;
 CREATE TRIGGER update_profiles_modtime
 BEFORE UPDATE ON public.profiles
 FOR EACH ROW EXECUTE FUNCTION update_modified_column();
 
+DROP TRIGGER IF EXISTS update_dietary_profiles_modtime ON public.dietary_profiles;
 CREATE TRIGGER update_dietary_profiles_modtime
 BEFORE UPDATE ON public.dietary_profiles
 FOR EACH ROW EXECUTE FUNCTION update_modified_column();
 
+DROP TRIGGER IF EXISTS update_meal_plans_modtime ON public.meal_plans;
 CREATE TRIGGER update_meal_plans_modtime
 BEFORE UPDATE ON public.meal_plans
 FOR EACH ROW EXECUTE FUNCTION update_modified_column();
 
+DROP TRIGGER IF EXISTS update_meals_modtime ON public.meals;
 CREATE TRIGGER update_meals_modtime
 BEFORE UPDATE ON public.meals
 FOR EACH ROW EXECUTE FUNCTION update_modified_column();
 
+DROP TRIGGER IF EXISTS update_shopping_lists_modtime ON public.shopping_lists;
 CREATE TRIGGER update_shopping_lists_modtime
 BEFORE UPDATE ON public.shopping_lists
 FOR EACH ROW EXECUTE FUNCTION update_modified_column();
 
+DROP TRIGGER IF EXISTS update_shopping_list_items_modtime ON public.shopping_list_items;
 CREATE TRIGGER update_shopping_list_items_modtime
 BEFORE UPDATE ON public.shopping_list_items
 FOR EACH ROW EXECUTE FUNCTION update_modified_column();
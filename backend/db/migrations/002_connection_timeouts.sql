@@ -0,0 +1,8 @@
+-- Reclaim idle connections so API workers sharing the connection pooler
+-- cannot pin database backends indefinitely
+
+-- Close sessions that sit idle for more than 5 minutes
+ALTER DATABASE postgres SET idle_session_timeout = 300000;
+
+-- Abort transactions left open and idle for more than 1 minute
+ALTER DATABASE postgres SET idle_in_transaction_session_timeout = 60000;
@@ -0,0 +1,22 @@
+-- Update many shopping list items in one statement.
+-- Checking off a whole trip's worth of items is one round trip instead of a
+-- request per item.
+
+-- Apply {item_id, is_purchased} patches to items of one shopping list and
+-- return how many rows were updated
+CREATE OR REPLACE FUNCTION public.bulk_update_items(list_id UUID, patches JSONB)
+RETURNS INTEGER AS $$
+DECLARE
+    updated INTEGER;
+BEGIN
+    UPDATE public.shopping_list_items AS items
+    SET is_purchased = p.is_purchased,
+        updated_at = NOW()
+    FROM jsonb_to_recordset(patches) AS p(item_id UUID, is_purchased BOOLEAN)
+    WHERE items.id = p.item_id
+      AND items.shopping_list_id = list_id;
+
+    GET DIAGNOSTICS updated = ROW_COUNT;
+    RETURN updated;
+END;
+$$ LANGUAGE plpgsql;
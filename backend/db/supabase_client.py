@@ -4,6 +4,7 @@ This module provides a Python client for interacting with Supabase
 """
 
 import os
+import importlib.util
 import httpx
 from typing import Dict, List, Optional, Any
 from dotenv import load_dotenv
@@ -11,6 +12,9 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
+# HTTP/2 needs the optional h2 package
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
 class SupabaseClient:
     """Client for interacting with Supabase from Python"""
     
@@ -27,6 +31,26 @@ class SupabaseClient:
         # Validate configuration
         if not self.supabase_key:
             raise ValueError("SUPABASE_SERVICE_KEY environment variable is not set")
+        
+        # Created on first use and shared by every call, so requests reuse
+        # keep-alive connections instead of a new TLS handshake per call
+        self._client: Optional[httpx.AsyncClient] = None
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """Return the client's shared HTTP client, creating it on first use"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=_HTTP2_AVAILABLE,
+                timeout=httpx.Timeout(10.0, connect=2.0),
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=50, keepalive_expiry=30)
+            )
+        return self._client
+    
+    async def aclose(self) -> None:
+        """Close the shared HTTP client"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
     
     async def select(self, table: str, columns: str = "*", filters: Dict = None) -> List[Dict]:
         """
@@ -47,10 +71,10 @@ class SupabaseClient:
             for key, value in filters.items():
                 url += f"&{key}=eq.{value}"
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=self.headers)
-            response.raise_for_status()
-            return response.json()
+        client = self._get_client()
+        response = await client.get(url, headers=self.headers)
+        response.raise_for_status()
+        return response.json()
     
     async def insert(self, table: str, data: Dict) -> Dict:
         """
@@ -65,15 +89,15 @@ class SupabaseClient:
         """
         url = f"{self.supabase_url}/rest/v1/{table}"
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                url,
-                headers=self.headers,
-                json=data,
-                params={"select": "*"}
-            )
-            response.raise_for_status()
-            return response.json()[0] if response.json() else {}
+        client = self._get_client()
+        response = await client.post(
+            url,
+            headers=self.headers,
+            json=data,
+            params={"select": "*"}
+        )
+        response.raise_for_status()
+        return response.json()[0] if response.json() else {}
     
     async def update(self, table: str, id_column: str, id_value: str, data: Dict) -> Dict:
         """
@@ -94,15 +118,15 @@ class SupabaseClient:
             f"{id_column}": f"eq.{id_value}"
         }
         
-        async with httpx.AsyncClient() as client:
-            response = await client.patch(
-                url,
-                headers=self.headers,
-                json=data,
-                params=params
-            )
-            response.raise_for_status()
-            return response.json()[0] if response.json() else {}
+        client = self._get_client()
+        response = await client.patch(
+            url,
+            headers=self.headers,
+            json=data,
+            params=params
+        )
+        response.raise_for_status()
+        return response.json()[0] if response.json() else {}
     
     async def delete(self, table: str, id_column: str, id_value: str) -> Dict:
         """
@@ -122,14 +146,14 @@ class SupabaseClient:
             f"{id_column}": f"eq.{id_value}"
         }
         
-        async with httpx.AsyncClient() as client:
-            response = await client.delete(
-                url,
-                headers=self.headers,
-                params=params
-            )
-            response.raise_for_status()
-            return response.json()[0] if response.json() else {}
+        client = self._get_client()
+        response = await client.delete(
+            url,
+            headers=self.headers,
+            params=params
+        )
+        response.raise_for_status()
+        return response.json()[0] if response.json() else {}
     
     async def execute_sql(self, query: str, params: Dict = None) -> List[Dict]:
         """
@@ -148,14 +172,14 @@ class SupabaseClient:
             "params": params or {}
         }
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                url,
-                headers=self.headers,
-                json=data
-            )
-            response.raise_for_status()
-            return response.json()
+        client = self._get_client()
+        response = await client.post(
+            url,
+            headers=self.headers,
+            json=data
+        )
+        response.raise_for_status()
+        return response.json()
 
 # Create a singleton instance
 supabase = SupabaseClient()
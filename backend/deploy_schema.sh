@@ -1,7 +1,7 @@
 #!/bin/bash
 
 # Deploy Supabase schema to local instance
-# This script deploys the initial schema to a local Supabase instance
+# This script applies every migration, in order, to a local Supabase instance
 
 # Configuration
 DB_HOST="localhost"
@@ -9,7 +9,7 @@ DB_PORT="54322"
 DB_USER="postgres"
 DB_PASSWORD="postgres"
 DB_NAME="postgres"
-SCHEMA_FILE="./db/migrations/001_initial_schema.sql"
+MIGRATIONS_DIR="./db/migrations"
 
 # Check if psql is installed
 if ! command -v psql &> /dev/null; then
@@ -17,24 +17,29 @@ if ! command -v psql &> /dev/null; then
     exit 1
 fi
 
-# Check if schema file exists
-if [ ! -f "$SCHEMA_FILE" ]; then
-    echo "Error: Schema file not found at $SCHEMA_FILE"
+# Check if migrations exist
+if ! ls $MIGRATIONS_DIR/*.sql &> /dev/null; then
+    echo "Error: No migration files found in $MIGRATIONS_DIR"
     exit 1
 fi
 
 echo "Deploying schema to local Supabase instance..."
-echo "Using schema file: $SCHEMA_FILE"
 
-# Deploy schema
-PGPASSWORD=$DB_PASSWORD psql -h $DB_HOST -p $DB_PORT -U $DB_USER -d $DB_NAME -f $SCHEMA_FILE
-
-if [ $? -eq 0 ]; then
-    echo "Schema deployed successfully!"
-    echo "You can now verify the schema using the verify_schema.sh script."
-else
-    echo "Error: Failed to deploy schema."
-    exit 1
-fi
+# Deploy each migration in order. Migrations are idempotent, so re-deploying
+# to pick up new ones is safe; each runs in one transaction and psql exits
+# non-zero on the first failing statement
+for SCHEMA_FILE in $MIGRATIONS_DIR/*.sql; do
+    echo "Using schema file: $SCHEMA_FILE"
+    PGPASSWORD=$DB_PASSWORD psql -h $DB_HOST -p $DB_PORT -U $DB_USER -d $DB_NAME \
+        -v ON_ERROR_STOP=1 --single-transaction -f $SCHEMA_FILE
+
+    if [ $? -ne 0 ]; then
+        echo "Error: Failed to deploy schema."
+        exit 1
+    fi
+done
+
+echo "Schema deployed successfully!"
+echo "You can now verify the schema using the verify_schema.sh script."
 
 exit 0
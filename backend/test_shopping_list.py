@@ -6,15 +6,15 @@ import os
 import json
 import uuid
 from dotenv import load_dotenv
-from api.openai_service import OpenAIService
+from api.openai_service import get_openai_service
 
 # Load environment variables from .env file
 load_dotenv()
 
 async def test_shopping_list_generation():
     """Test the shopping list generation functionality."""
-    # Create an OpenAI service instance
-    openai_service = OpenAIService()
+    # Get the shared OpenAI service instance
+    openai_service = get_openai_service()
     
     # Generate random UUIDs for testing
     user_id = str(uuid.uuid4())
@@ -36,3 +36,13 @@ class TestAPI:
         """Test the meal plans endpoint"""
         response = client.get("/api/meal-plans")
         assert response.status_code == 200
+    
+    def test_request_timing_logged(self, caplog):
+        """Test that each request logs its route template, status and duration"""
+        with caplog.at_level("INFO", logger="hungryjack.timing"):
+            client.get("/api/health")
+        
+        record = caplog.records[-1]
+        assert record.route == "/api/health"
+        assert record.status == 200
+        assert record.duration_ns > 0
@@ -0,0 +1,114 @@
+"""
+Tests for the cache backends.
+"""
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from api.cache import MemoryCache, RedisCache, completion_cache_key, create_cache
+
+class TestMemoryCache:
+    """Test suite for the in-memory cache."""
+    
+    @pytest.mark.asyncio
+    async def test_get_and_set(self):
+        """Test storing and retrieving values."""
+        cache = MemoryCache()
+        
+        assert await cache.get("missing") is None
+        
+        await cache.set("key", "value")
+        assert await cache.get("key") == "value"
+    
+    @pytest.mark.asyncio
+    async def test_expiry(self):
+        """Test that entries expire after their time to live."""
+        cache = MemoryCache()
+        
+        with patch("api.cache.time.monotonic", return_value=100.0):
+            await cache.set("key", "value", ex=10)
+        
+        with patch("api.cache.time.monotonic", return_value=105.0):
+            assert await cache.get("key") == "value"
+        
+        with patch("api.cache.time.monotonic", return_value=110.0):
+            assert await cache.get("key") is None
+    
+    @pytest.mark.asyncio
+    async def test_evicts_least_recently_used(self):
+        """Test that the least recently used entry is evicted when full."""
+        cache = MemoryCache(maxsize=2)
+        
+        await cache.set("a", "1")
+        await cache.set("b", "2")
+        await cache.get("a")
+        await cache.set("c", "3")
+        
+        assert await cache.get("a") == "1"
+        assert await cache.get("b") is None
+        assert await cache.get("c") == "3"
+    
+    @pytest.mark.asyncio
+    async def test_delete(self):
+        """Test that deleted entries are gone and missing keys are ignored."""
+        cache = MemoryCache()
+        
+        await cache.set("key", "value")
+        await cache.delete("key")
+        await cache.delete("missing")
+        
+        assert await cache.get("key") is None
+    
+    def test_completion_cache_key(self):
+        """Test that completion keys depend on every part of the request."""
+        key = completion_cache_key("gpt-4o", 0.7, "system", "user")
+        
+        assert key == completion_cache_key("gpt-4o", 0.7, "system", "user")
+        assert key != completion_cache_key("gpt-4o-mini", 0.7, "system", "user")
+        assert key != completion_cache_key("gpt-4o", 0.2, "system", "user")
+        assert key != completion_cache_key("gpt-4o", 0.7, "system", "other user")
+
+class TestRedisCache:
+    """Test suite for the Redis-backed cache."""
+    
+    @pytest.mark.asyncio
+    async def test_get_and_set(self):
+        """Test that reads and writes go to the Redis client."""
+        client = MagicMock()
+        client.get = AsyncMock(return_value="value")
+        client.set = AsyncMock()
+        cache = RedisCache(client)
+        
+        await cache.set("key", "value", ex=60)
+        
+        assert await cache.get("key") == "value"
+        client.set.assert_awaited_once_with("key", "value", ex=60)
+        
+        client.delete = AsyncMock()
+        await cache.delete("key")
+        client.delete.assert_awaited_once_with("key")
+    
+    @pytest.mark.asyncio
+    async def test_errors_are_treated_as_misses(self):
+        """Test that an unreachable Redis never fails the caller."""
+        client = MagicMock()
+        client.get = AsyncMock(side_effect=ConnectionError("refused"))
+        client.set = AsyncMock(side_effect=ConnectionError("refused"))
+        cache = RedisCache(client)
+        
+        await cache.set("key", "value")
+        
+        assert await cache.get("key") is None
+
+def test_create_cache_defaults_to_memory():
+    """Test that the in-memory cache is used without REDIS_URL."""
+    with patch.dict("os.environ", {}, clear=True):
+        assert isinstance(create_cache(), MemoryCache)
+
+def test_create_cache_uses_redis_url():
+    """Test that REDIS_URL selects the Redis cache."""
+    fake_redis = MagicMock()
+    with patch.dict("os.environ", {"REDIS_URL": "redis://cache:6379/0"}), patch("api.cache.redis", fake_redis):
+        cache = create_cache()
+    
+    assert isinstance(cache, RedisCache)
+    fake_redis.from_url.assert_called_once_with("redis://cache:6379/0", decode_responses=True)
@@ -2,9 +2,13 @@
 Tests for the nutrition service.
 """
 import os
+import asyncio
 import pytest
 from unittest.mock import patch, MagicMock, AsyncMock
 import json
+import orjson
+import httpx
+from pydantic import ValidationError
 
 from api.nutrition_service import (
     NutritionService,
@@ -109,6 +113,25 @@ class TestNutritionService:
         assert default.carbs_grams == 20
         assert default.fat_grams == 10
     
+    def test_estimated_nutrition_data_is_read_only(self):
+        """Test that memoized estimates cannot be changed by a caller."""
+        estimate = self.nutrition_service._get_estimated_nutrition_data("grilled chicken breast")
+        
+        with pytest.raises(ValidationError):
+            estimate.calories = 0
+        
+        assert self.nutrition_service._get_estimated_nutrition_data("grilled chicken breast").calories == 250
+    
+    def test_get_estimated_nutrition_data_word_matching(self):
+        """Test that punctuation separates words and keywords still match inside words."""
+        estimate = self.nutrition_service._get_estimated_nutrition_data
+        
+        # Category priority decides between words, not word order
+        assert estimate("Olive oil, meatballs") is estimate("chicken")
+        assert estimate("sweet potatoes (mashed)") is estimate("rice")
+        assert estimate("peanut-butter") is estimate("almonds")
+        assert estimate("pineapple") is estimate("banana")
+    
     def test_calculate_meal_nutrition_with_estimated_data(self):
         """Test calculating meal nutrition with estimated data."""
         nutrition_data = self.nutrition_service.calculate_meal_nutrition(
@@ -138,6 +161,24 @@ class TestNutritionService:
         assert nutrition_data.carbs_grams > 0
         assert nutrition_data.fat_grams >= 0
     
+    @pytest.mark.asyncio
+    async def test_calculate_meal_nutrition_async(self):
+        """Test that concurrent per-ingredient lookups sum to the same totals."""
+        self.nutrition_service.use_usda_api = False
+        
+        nutrition_data = await self.nutrition_service.calculate_meal_nutrition_async(
+            self.test_ingredients
+        )
+        expected = self.nutrition_service.calculate_meal_nutrition(self.test_ingredients)
+        
+        assert nutrition_data.calories == expected.calories
+        assert nutrition_data.protein_grams == expected.protein_grams
+        assert nutrition_data.carbs_grams == expected.carbs_grams
+        assert nutrition_data.fat_grams == expected.fat_grams
+        
+        empty = await self.nutrition_service.calculate_meal_nutrition_async([])
+        assert empty.calories == 0
+    
     def test_calculate_day_nutrition(self):
         """Test calculating day nutrition from meals."""
         meals = [
@@ -167,29 +208,47 @@ class TestNutritionService:
         assert day_nutrition["total_protein_grams"] == 77
         assert day_nutrition["total_carbs_grams"] == 150
         assert day_nutrition["total_fat_grams"] == 58
+        # Integer meal macros stay integers for the INTEGER total_* columns
+        assert all(type(total) is int for total in day_nutrition.values())
+    
+    def test_calculate_day_nutrition_missing_values(self):
+        """Test that missing or null meal values count as zero."""
+        meals = [
+            {"calories": 400, "protein_grams": None},
+            {"calories": 0.1, "carbs_grams": 0.2, "fat_grams": 5}
+        ]
+        
+        day_nutrition = self.nutrition_service.calculate_day_nutrition(meals)
+        
+        assert day_nutrition == {
+            "total_calories": 400.1,
+            "total_protein_grams": 0,
+            "total_carbs_grams": 0.2,
+            "total_fat_grams": 5
+        }
+        assert self.nutrition_service.calculate_day_nutrition([])["total_calories"] == 0
     
     @pytest.mark.asyncio
     async def test_get_usda_nutrition_data(self):
         """Test getting nutrition data from the USDA API."""
-        with patch("httpx.AsyncClient") as mock_client:
+        with patch.object(self.nutrition_service, "_client") as mock_client_instance:
             # Setup mock responses
-            mock_client_instance = AsyncMock()
-            mock_client.return_value.__aenter__.return_value = mock_client_instance
+            mock_client_instance.get = AsyncMock()
             
             # Mock search response
             search_response = MagicMock()
-            search_response.json.return_value = {
+            search_response.content = orjson.dumps({
                 "foods": [
                     {
                         "fdcId": 123456,
                         "description": "Chicken, broilers or fryers, breast, meat only, cooked, roasted"
                     }
                 ]
-            }
+            })
             
             # Mock detail response
             detail_response = MagicMock()
-            detail_response.json.return_value = {
+            detail_response.content = orjson.dumps({
                 "fdcId": 123456,
                 "description": "Chicken, broilers or fryers, breast, meat only, cooked, roasted",
                 "foodNutrients": [
@@ -258,7 +317,7 @@ class TestNutritionService:
                         "amount": 85.0
                     }
                 ]
-            }
+            })
             
             # Set up the mock responses in order
             mock_client_instance.get.side_effect = [
@@ -278,20 +337,106 @@ class TestNutritionService:
             assert result.sugar_grams == 0.0
             assert result.sodium_mg == 74.0
             assert result.cholesterol_mg == 85.0
+            assert result.detailed_nutrients is None
+    
+    @pytest.mark.asyncio
+    async def test_get_usda_nutrition_data_detailed(self):
+        """Test that the detailed nutrient breakdown is only built on request."""
+        with patch.object(self.nutrition_service, "_client") as mock_client_instance:
+            mock_client_instance.get = AsyncMock()
+            
+            search_response = MagicMock()
+            search_response.content = orjson.dumps({"foods": [{"fdcId": 1}]})
+            detail_response = MagicMock()
+            detail_response.content = orjson.dumps({
+                "foodNutrients": [
+                    {"nutrient": {"id": 1008, "name": "Energy", "unitName": "kcal"}, "amount": 90.0},
+                    {"nutrient": {"id": 1162, "name": "Vitamin C", "unitName": "mg"}, "amount": 8.7}
+                ]
+            })
+            mock_client_instance.get.side_effect = [search_response, detail_response]
+            
+            result = await self.nutrition_service._get_usda_nutrition_data("banana", include_detailed=True)
+            
+            assert result.calories == 90.0
+            assert [nutrient.name for nutrient in result.detailed_nutrients] == ["Energy", "Vitamin C"]
+            assert result.model_dump()["detailed_nutrients"][1] == {
+                "name": "Vitamin C",
+                "amount": 8.7,
+                "unit": "mg",
+                "percent_daily_value": None
+            }
+    
+    @pytest.mark.asyncio
+    async def test_get_usda_nutrition_data_is_cached(self):
+        """Test that repeat USDA lookups for the same food are served from the cache."""
+        with patch.object(self.nutrition_service, "_client") as mock_client_instance:
+            mock_client_instance.get = AsyncMock()
+            
+            search_response = MagicMock()
+            search_response.content = orjson.dumps({"foods": [{"fdcId": 1}]})
+            detail_response = MagicMock()
+            detail_response.content = orjson.dumps({
+                "foodNutrients": [{"nutrient": {"id": 1008, "name": "Energy", "unitName": "kcal"}, "amount": 90.0}]
+            })
+            mock_client_instance.get.side_effect = [search_response, detail_response]
+            
+            first = await self.nutrition_service._get_usda_nutrition_data("Banana")
+            second = await self.nutrition_service._get_usda_nutrition_data(" banana ")
+            
+            assert mock_client_instance.get.await_count == 2
+            assert second is first
+            assert second.calories == 90.0
+    
+    @pytest.mark.asyncio
+    async def test_get_nutrition_data_coalesces_concurrent_lookups(self):
+        """Test that concurrent lookups for the same food share one USDA request."""
+        lookups = 0
+        
+        async def slow_lookup(food_name, quantity=None, include_detailed=False):
+            nonlocal lookups
+            lookups += 1
+            await asyncio.sleep(0.01)
+            return NutritionData(calories=90, protein_grams=1, carbs_grams=23, fat_grams=0)
+        
+        with patch.object(self.nutrition_service, "_get_usda_nutrition_data", side_effect=slow_lookup):
+            results = await asyncio.gather(*[
+                self.nutrition_service.get_nutrition_data(name) for name in ["banana", "Banana", " banana"]
+            ])
+        
+        assert lookups == 1
+        assert all(result is results[0] for result in results)
+        assert self.nutrition_service._inflight == {}
+    
+    @pytest.mark.asyncio
+    async def test_usda_get_retries_rate_limited_requests(self):
+        """Test that rate limited USDA requests are retried."""
+        request = httpx.Request("GET", "https://api.nal.usda.gov/fdc/v1/foods/search")
+        with patch.object(self.nutrition_service, "_client") as mock_client_instance, \
+                patch("asyncio.sleep", new_callable=AsyncMock):
+            mock_client_instance.get = AsyncMock(side_effect=[
+                httpx.Response(429, request=request),
+                httpx.Response(503, request=request),
+                httpx.Response(200, request=request, content=b'{"foods": []}')
+            ])
+            
+            response = await self.nutrition_service._usda_get("/fdc/v1/foods/search", {})
+            
+            assert response.status_code == 200
+            assert mock_client_instance.get.await_count == 3
     
     @pytest.mark.asyncio
     async def test_get_usda_nutrition_data_no_results(self):
         """Test getting nutrition data from the USDA API with no results."""
-        with patch("httpx.AsyncClient") as mock_client:
+        with patch.object(self.nutrition_service, "_client") as mock_client_instance:
             # Setup mock responses
-            mock_client_instance = AsyncMock()
-            mock_client.return_value.__aenter__.return_value = mock_client_instance
+            mock_client_instance.get = AsyncMock()
             
             # Mock search response with no results
             search_response = MagicMock()
-            search_response.json.return_value = {
+            search_response.content = orjson.dumps({
                 "foods": []
-            }
+            })
             
             mock_client_instance.get.return_value = search_response
             
@@ -326,10 +471,9 @@ class TestNutritionService:
     @pytest.mark.asyncio
     async def test_get_nutrition_data_usda_error(self):
         """Test getting nutrition data when USDA API fails."""
-        with patch("httpx.AsyncClient") as mock_client:
+        with patch.object(self.nutrition_service, "_client") as mock_client_instance:
             # Setup mock responses
-            mock_client_instance = AsyncMock()
-            mock_client.return_value.__aenter__.return_value = mock_client_instance
+            mock_client_instance.get = AsyncMock()
             
             # Mock search response with error
             mock_client_instance.get.side_effect = Exception("API error")
@@ -342,3 +486,13 @@ class TestNutritionService:
             assert result.protein_grams > 0
             assert result.carbs_grams >= 0
             assert result.fat_grams > 0
+    
+    @pytest.mark.asyncio
+    async def test_usda_client_is_reused(self):
+        """Test that USDA lookups share one pooled client pointed at the USDA API."""
+        service = NutritionService()
+        
+        assert str(service._client.base_url).rstrip("/") == "https://api.nal.usda.gov"
+        
+        await service.aclose()
+        assert service._client.is_closed
@@ -2,16 +2,36 @@
 Tests for the OpenAI service
 """
 
+import asyncio
+import re
+import orjson
 import pytest
+from pydantic import ValidationError
 import os
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
 # Import the OpenAI service
-from api.openai_service import OpenAIService, MealPlan
+from api.openai_service import (
+    OpenAIService, MealPlan, InfeasibleProfileError, EmptyMealPlanError, _precheck_profile, _DAY_PLANS_RESPONSE_FORMAT, _DayStreamParser,
+    _DAY_PLANS_ADAPTER, _MOCK_DAY_BODY
+)
+
+async def _stream_chunks(*parts):
+    """Yield mock streaming chunks with the given content deltas"""
+    for part in parts:
+        chunk = MagicMock()
+        chunk.choices = [MagicMock()]
+        chunk.choices[0].delta.content = part
+        yield chunk
+
+def _days_response(**kwargs):
+    """Stream back as many days as the user prompt asks for"""
+    days = int(re.search(r"meal plan for (\d+) days", kwargs["messages"][1]["content"]).group(1))
+    return _stream_chunks(orjson.dumps({"days": [{"day_number": 1, "meals": []}] * days}).decode())
 
 class TestOpenAIService:
     """Test cases for the OpenAI service"""
@@ -25,17 +45,9 @@ class TestOpenAIService:
         assert os.getenv("OPENAI_API_KEY") is not None, "OPENAI_API_KEY environment variable is not set"
     
     @pytest.mark.asyncio
-    @patch("api.openai_service.OpenAI")
-    async def test_generate_meal_plan(self, mock_openai):
-        """Test meal plan generation with mocked OpenAI API"""
-        # Mock the OpenAI client
-        mock_client = MagicMock()
-        mock_openai.return_value = mock_client
-        
-        # Mock the chat completions response
-        mock_response = MagicMock()
-        mock_message = MagicMock()
-        mock_message.content = """
+    async def test_generate_meal_plan(self):
+        """Test meal plan generation with a mocked streaming OpenAI completion"""
+        completion = """
         {
           "days": [
             {
@@ -83,204 +95,412 @@ class TestOpenAIService:
           ]
         }
         """
-        mock_choice = MagicMock()
-        mock_choice.message = mock_message
-        mock_response.choices = [mock_choice]
-        mock_client.chat.completions.create.return_value = mock_response
-        
-        # Create the OpenAI service
         service = OpenAIService()
-        
-        # Test dietary profile
-        dietary_profile = {
-            "id": "profile-123",
-            "user_id": "user-123",
-            "goal": "weight_loss",
-            "diet_type": "omnivore",
-            "calories_per_day": 2000,
-            "allergies": ["peanuts"],
-            "excluded_foods": ["shellfish"],
-            "preferred_foods": ["chicken", "broccoli"]
-        }
+        service.use_mock = False
+        service.client = MagicMock()
+        service.client.chat.completions.create = AsyncMock(side_effect=lambda **kwargs: _stream_chunks(completion))
         
         # Generate a meal plan
-        meal_plan = await service.generate_meal_plan(dietary_profile, days=1)
+        meal_plan = await service.generate_meal_plan("user-789", "profile-789", 1, "2025-04-25", "2025-04-25")
         
         # Verify the result
-        assert isinstance(meal_plan, MealPlan)
-        assert meal_plan.user_id == "user-123"
-        assert meal_plan.dietary_profile_id == "profile-123"
-        assert len(meal_plan.days) == 1
-        assert meal_plan.days[0].day_number == 1
-        assert len(meal_plan.days[0].meals) == 3
-        
-        # Verify that the OpenAI API was called with the correct parameters
-        mock_client.chat.completions.create.assert_called_once()
-        call_args = mock_client.chat.completions.create.call_args[1]
+        assert meal_plan["user_id"] == "user-789"
+        assert meal_plan["dietary_profile_id"] == "profile-789"
+        assert len(meal_plan["days"]) == 1
+        assert meal_plan["days"][0]["day_number"] == 1
+        assert meal_plan["days"][0]["date"] == "2025-04-25"
+        assert [meal["meal_type"] for meal in meal_plan["days"][0]["meals"]] == ["breakfast", "lunch", "dinner"]
+        
+        # Verify that OpenAI was asked for a streamed, schema-constrained completion
+        service.client.chat.completions.create.assert_awaited_once()
+        call_args = service.client.chat.completions.create.call_args.kwargs
         assert call_args["model"] == service.model
-        assert call_args["response_format"] == {"type": "json_object"}
-        assert len(call_args["messages"]) == 2
-        assert call_args["messages"][0]["role"] == "system"
-        assert call_args["messages"][1]["role"] == "user"
+        assert call_args["stream"] is True
+        assert call_args["response_format"] == _DAY_PLANS_RESPONSE_FORMAT
+        assert [message["role"] for message in call_args["messages"]] == ["system", "user"]
     
     @pytest.mark.asyncio
-    @patch("api.openai_service.OpenAI")
-    async def test_generate_shopping_list(self, mock_openai):
-        """Test shopping list generation with mocked OpenAI API"""
-        # Mock the OpenAI client
-        mock_client = MagicMock()
-        mock_openai.return_value = mock_client
-        
-        # Mock the chat completions response
-        mock_response = MagicMock()
-        mock_message = MagicMock()
-        mock_message.content = """
+    async def test_generate_shopping_list(self):
+        """Test shopping list generation with a mocked streaming OpenAI completion"""
+        completion = """
         {
           "categories": [
             {
-              "name": "Produce",
-              "items": [
-                {
-                  "item_name": "Mixed berries",
-                  "quantity": "1/2 cup"
-                },
-                {
-                  "item_name": "Mixed greens",
-                  "quantity": "2 cups"
-                },
-                {
-                  "item_name": "Broccoli",
-                  "quantity": "1 cup"
-                },
-                {
-                  "item_name": "Carrots",
-                  "quantity": "1 cup"
-                }
-              ]
-            },
-            {
-              "name": "Protein",
-              "items": [
-                {
-                  "item_name": "Chicken breast",
-                  "quantity": "4 oz"
-                },
-                {
-                  "item_name": "Salmon fillet",
-                  "quantity": "6 oz"
-                }
-              ]
-            },
-            {
-              "name": "Grains",
+              "name": "Pantry",
               "items": [
-                {
-                  "item_name": "Rolled oats",
-                  "quantity": "1 cup"
-                }
-              ]
-            },
-            {
-              "name": "Dairy & Alternatives",
-              "items": [
-                {
-                  "item_name": "Almond milk",
-                  "quantity": "1 cup"
-                }
-              ]
-            },
-            {
-              "name": "Condiments & Oils",
-              "items": [
-                {
-                  "item_name": "Honey",
-                  "quantity": "1 tbsp"
-                },
-                {
-                  "item_name": "Olive oil",
-                  "quantity": "3 tbsp"
-                },
-                {
-                  "item_name": "Balsamic vinegar",
-                  "quantity": "1 tbsp"
-                }
+                {"item_name": "Honey", "quantity": "1", "unit": "tbsp", "note": ""},
+                {"item_name": "Olive oil", "quantity": "2", "unit": "tbsp", "note": ""}
               ]
             }
           ]
         }
         """
-        mock_choice = MagicMock()
-        mock_choice.message = mock_message
-        mock_response.choices = [mock_choice]
-        mock_client.chat.completions.create.return_value = mock_response
-        
-        # Create the OpenAI service
         service = OpenAIService()
-        
-        # Test meal plan
-        meal_plan_data = {
-            "user_id": "user-123",
-            "dietary_profile_id": "profile-123",
-            "start_date": "2025-04-25",
-            "end_date": "2025-04-25",
-            "days": [
-                {
-                    "day_number": 1,
-                    "meals": [
-                        {
-                            "meal_type": "breakfast",
-                            "name": "Oatmeal with Berries",
-                            "description": "Hearty oatmeal with mixed berries",
-                            "calories": 350,
-                            "protein_grams": 10,
-                            "carbs_grams": 60,
-                            "fat_grams": 7,
-                            "ingredients": ["1 cup rolled oats", "1 cup almond milk", "1/2 cup mixed berries", "1 tbsp honey"],
-                            "recipe": "1. Cook oats with almond milk\n2. Top with berries and honey"
-                        },
-                        {
-                            "meal_type": "lunch",
-                            "name": "Chicken Salad",
-                            "description": "Grilled chicken with mixed greens",
-                            "calories": 450,
-                            "protein_grams": 35,
-                            "carbs_grams": 20,
-                            "fat_grams": 25,
-                            "ingredients": ["4 oz grilled chicken", "2 cups mixed greens", "1 tbsp olive oil", "1 tbsp balsamic vinegar"],
-                            "recipe": "1. Grill chicken\n2. Toss with greens and dressing"
-                        },
-                        {
-                            "meal_type": "dinner",
-                            "name": "Salmon with Vegetables",
-                            "description": "Baked salmon with roasted vegetables",
-                            "calories": 550,
-                            "protein_grams": 40,
-                            "carbs_grams": 30,
-                            "fat_grams": 30,
-                            "ingredients": ["6 oz salmon fillet", "1 cup broccoli", "1 cup carrots", "1 tbsp olive oil"],
-                            "recipe": "1. Season salmon\n2. Roast vegetables\n3. Bake salmon"
-                        }
-                    ]
-                }
-            ]
-        }
-        meal_plan = MealPlan(**meal_plan_data)
+        service.use_mock = False
+        service.client = MagicMock()
+        service.client.chat.completions.create = AsyncMock(side_effect=lambda **kwargs: _stream_chunks(completion))
         
         # Generate a shopping list
-        shopping_list = await service.generate_shopping_list(meal_plan)
+        shopping_list = await service.generate_shopping_list("user-123", "plan-123")
         
         # Verify the result
-        assert isinstance(shopping_list, dict)
         assert shopping_list["user_id"] == "user-123"
-        assert shopping_list["meal_plan_id"] == "profile-123"
-        assert "items" in shopping_list
+        assert shopping_list["meal_plan_id"] == "plan-123"
         assert len(shopping_list["items"]) > 0
+        for category in shopping_list["items"]:
+            assert category["name"]
+            assert all("item_name" in item and "quantity" in item for item in category["items"])
         
-        # Verify that the OpenAI API was called with the correct parameters
-        mock_client.chat.completions.create.assert_called_once()
-        call_args = mock_client.chat.completions.create.call_args[1]
+        # Verify that OpenAI was asked for a streamed JSON object
+        service.client.chat.completions.create.assert_awaited_once()
+        call_args = service.client.chat.completions.create.call_args.kwargs
         assert call_args["model"] == service.model
+        assert call_args["stream"] is True
         assert call_args["response_format"] == {"type": "json_object"}
-        assert len(call_args["messages"]) == 2
-        assert call_args["messages"][0]["role"] == "system"
-        assert call_args["messages"][1]["role"] == "user"
+        assert [message["role"] for message in call_args["messages"]] == ["system", "user"]
+    
+    @pytest.mark.asyncio
+    async def test_generate_meal_plan_requests_day_chunks(self):
+        """Test that multi-day plans are generated with one concurrent request per two days"""
+        service = OpenAIService()
+        service.use_mock = False
+        service.client = MagicMock()
+        service.client.chat.completions.create = AsyncMock(side_effect=_days_response)
+        
+        meal_plan = await service.generate_meal_plan("user-123", "profile-123", 3, "2025-04-25", "2025-04-27")
+        
+        calls = service.client.chat.completions.create.await_args_list
+        assert [call.kwargs["max_tokens"] for call in calls] == [3000, 1500]
+        assert calls[0].kwargs["response_format"]["json_schema"]["strict"] is True
+        assert "starting from 2025-04-27 and ending on 2025-04-27" in calls[1].kwargs["messages"][1]["content"]
+        assert [day["day_number"] for day in meal_plan["days"]] == [1, 2, 3]
+        assert [day["date"] for day in meal_plan["days"]] == ["2025-04-25", "2025-04-26", "2025-04-27"]
+    
+    @pytest.mark.asyncio
+    async def test_generate_meal_plan_reuses_cached_plan(self):
+        """Test that an identical plan request is served from the cache with fresh dates"""
+        service = OpenAIService()
+        service.use_mock = False
+        service.client = MagicMock()
+        service.client.chat.completions.create = AsyncMock(side_effect=_days_response)
+        
+        first = await service.generate_meal_plan("user-123", "profile-123", 2, "2025-04-25", "2025-04-26")
+        first["days"][0]["meals"].append({"name": "mutated"})
+        second = await service.generate_meal_plan("user-123", "profile-123", 2, "2025-05-01", "2025-05-02")
+        
+        assert service.client.chat.completions.create.await_count == 1
+        assert [day["date"] for day in second["days"]] == ["2025-05-01", "2025-05-02"]
+        assert second["days"][0]["meals"] == []
+    
+    @pytest.mark.asyncio
+    async def test_generate_meal_plan_shares_concurrent_generation(self):
+        """Test that concurrent identical plan requests make one set of completions"""
+        service = OpenAIService()
+        service.use_mock = False
+        service.client = MagicMock()
+        service.client.chat.completions.create = AsyncMock(side_effect=_days_response)
+        
+        first, second = await asyncio.gather(
+            service.generate_meal_plan("user-123", "profile-123", 2, "2025-04-25", "2025-04-26"),
+            service.generate_meal_plan("user-123", "profile-123", 2, "2025-05-01", "2025-05-02")
+        )
+        
+        assert service.client.chat.completions.create.await_count == 1
+        assert [day["date"] for day in first["days"]] == ["2025-04-25", "2025-04-26"]
+        assert [day["date"] for day in second["days"]] == ["2025-05-01", "2025-05-02"]
+        assert service._pending_plans == {}
+    
+    @pytest.mark.asyncio
+    async def test_generate_meal_plan_shares_cache_between_services(self):
+        """Test that a plan generated by one service is reused by another sharing its cache"""
+        first_service = OpenAIService()
+        second_service = OpenAIService()
+        for service in (first_service, second_service):
+            service.use_mock = False
+            service.client = MagicMock()
+            service.client.chat.completions.create = AsyncMock(
+                side_effect=lambda **kwargs: _stream_chunks('{"days": [{"day_number": 1, "meals": []}]}')
+            )
+        second_service._cache = first_service._cache
+        
+        await first_service.generate_meal_plan("user-123", "profile-123", 1, "2025-04-25", "2025-04-25")
+        meal_plan = await second_service.generate_meal_plan("user-456", "profile-456", 1, "2025-05-01", "2025-05-01")
+        
+        assert second_service.client.chat.completions.create.await_count == 0
+        assert meal_plan["user_id"] == "user-456"
+        assert meal_plan["days"][0]["date"] == "2025-05-01"
+    
+    @pytest.mark.asyncio
+    async def test_generate_meal_plan_bounds_inflight_requests(self):
+        """Test that concurrent completions are capped by the service semaphore"""
+        with patch.dict(os.environ, {"OPENAI_MAX_INFLIGHT": "2"}):
+            service = OpenAIService()
+        service.use_mock = False
+        service.client = MagicMock()
+        
+        inflight = 0
+        peak = 0
+        
+        async def create(**kwargs):
+            nonlocal inflight, peak
+            inflight += 1
+            peak = max(peak, inflight)
+            await asyncio.sleep(0.01)
+            inflight -= 1
+            return _stream_chunks('{"days": [{"day_number": 1, "meals": []}]}')
+        
+        service.client.chat.completions.create = create
+        
+        await service.generate_meal_plan("user-123", "profile-123", 5, "2025-04-25", "2025-04-29")
+        
+        assert peak == 2
+    
+    @pytest.mark.asyncio
+    async def test_generate_day_chunk_uses_completion_cache(self):
+        """Test that an identical prompt is answered from the completion cache"""
+        service = OpenAIService()
+        service.use_mock = False
+        service.client = MagicMock()
+        service.client.chat.completions.create = AsyncMock(
+            side_effect=lambda **kwargs: _stream_chunks('{"days": [{"day_number": 1, "meals": []}]}')
+        )
+        
+        first = await service._generate_day_chunk("same prompt")
+        second = await service._generate_day_chunk("same prompt")
+        
+        assert service.client.chat.completions.create.await_count == 1
+        assert second == first
+    
+    @pytest.mark.asyncio
+    async def test_complete_paces_requests_by_estimated_tokens(self):
+        """Test that completions draw their estimated tokens from the TPM limiter"""
+        service = OpenAIService()
+        service.use_mock = False
+        service.client = MagicMock()
+        service.client.chat.completions.create = AsyncMock(
+            side_effect=lambda **kwargs: _stream_chunks('{"days": []}')
+        )
+        service._tpm_limiter = MagicMock(max_rate=1000, acquire=AsyncMock())
+        service._rpm_limiter = MagicMock(acquire=AsyncMock())
+        
+        await service._complete("s" * 40, "p" * 400, 100)
+        await service._complete("s" * 40, "q" * 400, 5000)
+        
+        assert [call.args for call in service._tpm_limiter.acquire.await_args_list] == [(210,), (1000,)]
+        assert service._rpm_limiter.acquire.await_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_generate_day_chunk_validates_response(self):
+        """Test that strict mode rejects a day missing required fields and does not cache it"""
+        service = OpenAIService()
+        service.use_mock = False
+        service.strict_validation = True
+        service.client = MagicMock()
+        service.client.chat.completions.create = AsyncMock(
+            side_effect=lambda **kwargs: _stream_chunks('{"days": [{"day_number": "1"}]}')
+        )
+        
+        with pytest.raises(ValidationError):
+            await service._generate_day_chunk("bad prompt")
+        with pytest.raises(ValidationError):
+            await service._generate_day_chunk("bad prompt")
+        
+        assert service.client.chat.completions.create.await_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_generate_day_chunk_strict_keeps_detailed_nutrition_as_dict(self):
+        """Test that strict mode validates nested nutrition but returns it as a plain dict"""
+        service = OpenAIService()
+        service.use_mock = False
+        service.strict_validation = True
+        service.client = MagicMock()
+        meal = '{"name": "Oats", "description": "Bowl", "meal_type": "breakfast", "calories": 300, "protein_grams": 10, "carbs_grams": 50, "fat_grams": 6, "ingredients": ["oats"], "recipe": "Cook", "detailed_nutrition": {"fiber_grams": 4}}'
+        service.client.chat.completions.create = AsyncMock(
+            side_effect=lambda **kwargs: _stream_chunks('{"days": [{"day_number": 1, "meals": [' + meal + ']}]}')
+        )
+        
+        days = await service._generate_day_chunk("prompt")
+        
+        assert days[0]["meals"][0]["detailed_nutrition"] == {"fiber_grams": 4.0}
+    
+    @pytest.mark.asyncio
+    async def test_generate_shopping_list_strict_validation(self):
+        """Test that strict mode validates the shopping list completion"""
+        service = OpenAIService()
+        service.use_mock = False
+        service.strict_validation = True
+        service.client = MagicMock()
+        service.client.chat.completions.create = AsyncMock(
+            side_effect=lambda **kwargs: _stream_chunks('{"categories": [{"name": "Produce", "items": [{"item_name": "Lemon"}]}]}')
+        )
+        
+        with pytest.raises(Exception, match="Failed to generate shopping list"):
+            await service.generate_shopping_list("user-123", "plan-123")
+    
+    @pytest.mark.asyncio
+    async def test_generate_shopping_list_sends_only_unmatched_ingredients(self):
+        """Test that locally categorized ingredients are not sent to OpenAI"""
+        service = OpenAIService()
+        service.use_mock = False
+        service.client = MagicMock()
+        service.client.chat.completions.create = AsyncMock(
+            side_effect=lambda **kwargs: _stream_chunks(
+                '{"categories": [{"name": "Pantry", "items": [{"item_name": "Honey", "quantity": "1 tbsp"}]}]}'
+            )
+        )
+        
+        shopping_list = await service.generate_shopping_list("user-123", "plan-123")
+        
+        request = service.client.chat.completions.create.call_args.kwargs
+        assert request["response_format"] == {"type": "json_object"}
+        prompt = request["messages"][1]["content"]
+        assert "Honey" in prompt
+        assert "Chicken breast" not in prompt
+        assert "Greek yogurt" not in prompt
+        names = [category["name"] for category in shopping_list["items"]]
+        assert names[0] == "Protein"
+        assert "Pantry" in names
+    
+    @pytest.mark.asyncio
+    async def test_generate_shopping_list_rejects_plan_without_ingredients(self):
+        """Test that a plan with no ingredients is rejected before any OpenAI call"""
+        service = OpenAIService()
+        service.use_mock = False
+        service.client = MagicMock()
+        service.client.chat.completions.create = AsyncMock()
+        
+        with patch("api.openai_service._MOCK_SHOPPING_MEALS", [{"name": "Water", "ingredients": []}]):
+            with pytest.raises(EmptyMealPlanError, match="no ingredients"):
+                await service.generate_shopping_list("user-123", "plan-123")
+        
+        service.client.chat.completions.create.assert_not_awaited()
+    
+    @pytest.mark.asyncio
+    async def test_generate_day_chunk_trusts_response_by_default(self):
+        """Test that completions are not validated outside strict mode"""
+        service = OpenAIService()
+        service.use_mock = False
+        service.strict_validation = False
+        service.client = MagicMock()
+        service.client.chat.completions.create = AsyncMock(
+            side_effect=lambda **kwargs: _stream_chunks('{"days": [{"day_number": "1"}]}')
+        )
+        
+        assert await service._generate_day_chunk("prompt") == [{"day_number": "1"}]
+    
+    @pytest.mark.asyncio
+    async def test_generate_meal_plan_stream_yields_days_in_order(self):
+        """Test that streamed days arrive in order with their numbers and dates"""
+        service = OpenAIService()
+        service.use_mock = False
+        service.client = MagicMock()
+        service.client.chat.completions.create = AsyncMock(side_effect=_days_response)
+        
+        days = [
+            day async for day in service.generate_meal_plan_stream("user-123", "profile-123", 3, "2025-04-25", "2025-04-27")
+        ]
+        
+        assert [day["day_number"] for day in days] == [1, 2, 3]
+        assert [day["date"] for day in days] == ["2025-04-25", "2025-04-26", "2025-04-27"]
+        assert service.client.chat.completions.create.await_count == 2
+        
+        # The streamed plan is reused by later identical requests
+        meal_plan = await service.generate_meal_plan("user-123", "profile-123", 3, "2025-05-01", "2025-05-03")
+        assert service.client.chat.completions.create.await_count == 2
+        assert meal_plan["days"][0]["date"] == "2025-05-01"
+    
+    def test_day_stream_parser_splits_days(self):
+        """Test that days are emitted as their objects close, ignoring braces inside strings"""
+        parser = _DayStreamParser()
+        
+        assert parser.feed('{"days": [{"day_number": 1, "meals": [{"name": "Soup {') == []
+        assert parser.feed('hot}", "recipe": "Say \\"}\\""}]}, {"day_') == [
+            {"day_number": 1, "meals": [{"name": "Soup {hot}", "recipe": 'Say "}"'}]}
+        ]
+        assert parser.feed('number": 2, "meals": []}]}') == [{"day_number": 2, "meals": []}]
+    
+    @pytest.mark.asyncio
+    async def test_generate_meal_plan_stream_yields_day_before_chunk_finishes(self):
+        """Test that the first day of a chunk is yielded while the rest is still streaming"""
+        service = OpenAIService()
+        service.use_mock = False
+        service.client = MagicMock()
+        first_day_seen = asyncio.Event()
+        
+        async def slow_stream():
+            async for chunk in _stream_chunks('{"days": [{"day_number": 1, "meals": []}, '):
+                yield chunk
+            await first_day_seen.wait()
+            async for chunk in _stream_chunks('{"day_number": 2, "meals": []}]}'):
+                yield chunk
+        
+        service.client.chat.completions.create = AsyncMock(side_effect=lambda **kwargs: slow_stream())
+        
+        days = []
+        async for day in service.generate_meal_plan_stream("user-123", "profile-123", 2, "2025-04-25", "2025-04-26"):
+            days.append(day)
+            first_day_seen.set()
+        
+        assert [day["date"] for day in days] == ["2025-04-25", "2025-04-26"]
+    
+    @pytest.mark.asyncio
+    async def test_generate_meal_plan_rejects_infeasible_request(self):
+        """Test that infeasible requests fail before OpenAI is called"""
+        service = OpenAIService()
+        service.use_mock = False
+        service.client = MagicMock()
+        service.client.chat.completions.create = AsyncMock()
+        
+        with pytest.raises(InfeasibleProfileError):
+            await service.generate_meal_plan("user-123", "profile-123", 30, "2025-04-25", "2025-05-24")
+        
+        service.client.chat.completions.create.assert_not_awaited()
+    
+    def test_day_plans_response_format_is_strict(self):
+        """Test that the structured output schema follows OpenAI's strict mode rules"""
+        schema = _DAY_PLANS_RESPONSE_FORMAT["json_schema"]["schema"]
+        meal = schema["$defs"]["Meal"]
+        
+        assert meal["additionalProperties"] is False
+        assert set(meal["required"]) == set(meal["properties"])
+        assert "description" in meal["properties"]
+        assert "default" not in schema["properties"]["days"]
+    
+    def test_mock_day_matches_response_schema(self):
+        """Test that mock days use the same ingredient shape the response format asks for"""
+        schema = _DAY_PLANS_RESPONSE_FORMAT["json_schema"]["schema"]
+        assert schema["$defs"]["Meal"]["properties"]["ingredients"]["items"] == {"type": "string"}
+        
+        _DAY_PLANS_ADAPTER.validate_python({"days": [{"day_number": 1, **_MOCK_DAY_BODY}]})
+    
+    def test_shopping_list_prompt_counts_ingredients(self):
+        """Test that repeated ingredients are sent once with their number of occurrences"""
+        service = OpenAIService()
+        meal_plan = {
+            "days": [
+                {"meals": [{"ingredients": [{"name": "Olive oil", "quantity": "1 tbsp"}, "2 eggs"]}]},
+                {"meals": [{"ingredients": [{"name": "Olive oil", "quantity": "1 tbsp"}]}, {"name": "Water"}]}
+            ]
+        }
+        
+        prompt = service._create_shopping_list_prompt(service._count_ingredients(meal_plan))
+        ingredients = orjson.loads(prompt[prompt.index("["):])
+        
+        assert ingredients == [
+            {"ingredient": "1 tbsp Olive oil", "occurrences": 2},
+            {"ingredient": "2 eggs", "occurrences": 1}
+        ]
+    
+    def test_precheck_profile(self):
+        """Test the dietary profile feasibility checks"""
+        profile = {
+            "daily_calorie_target": 2000,
+            "allergies": ["Peanuts"],
+            "excluded_foods": ["shellfish"],
+            "preferred_foods": ["chicken", "broccoli"]
+        }
+        
+        assert _precheck_profile(profile, 7) is None
+        assert "days" in _precheck_profile(profile, 0)
+        assert "calorie" in _precheck_profile({**profile, "daily_calorie_target": 500}, 7)
+        assert "peanuts" in _precheck_profile({**profile, "preferred_foods": ["peanuts"]}, 7)
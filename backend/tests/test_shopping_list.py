@@ -3,9 +3,13 @@ Test module for shopping list functionality
 """
 import pytest
 import json
+import uuid
 from unittest.mock import AsyncMock, patch, MagicMock
+from fastapi import FastAPI
 from fastapi.testclient import TestClient
-from api.router import router, openai_service, supabase_service
+from api.router import router, get_openai_service, supabase_service
+from api.openai_service import InfeasibleProfileError
+from api.meal_plan_service import MealPlanService
 from api.supabase_service import ShoppingList, ShoppingListItem
 
 client = TestClient(router)
@@ -174,7 +178,7 @@ def mock_saved_shopping_list(mock_shopping_list):
     return result
 
 @patch("api.router.supabase_service")
-@patch("api.router.openai_service")
+@patch("api.router.get_openai_service")
 def test_get_meal_plan_ingredients(mock_openai, mock_supabase, mock_meal_plan):
     """Test getting all ingredients from a meal plan"""
     # Setup mock
@@ -192,13 +196,22 @@ def test_get_meal_plan_ingredients(mock_openai, mock_supabase, mock_meal_plan):
     assert "4 oz chicken breast" in data["ingredients"]
 
 @patch("api.router.supabase_service")
-@patch("api.router.openai_service")
-def test_generate_shopping_list(mock_openai, mock_supabase, mock_meal_plan, mock_shopping_list, mock_saved_shopping_list):
+@patch("api.router.get_openai_service")
+def test_generate_shopping_list(mock_openai, mock_supabase, mock_meal_plan):
     """Test generating a shopping list from a meal plan"""
-    # Setup mocks
-    mock_supabase.get_meal_plan = AsyncMock(return_value=mock_meal_plan)
-    mock_openai.generate_shopping_list = AsyncMock(return_value=mock_shopping_list)
-    mock_supabase.save_shopping_list = AsyncMock(return_value=mock_saved_shopping_list)
+    # The generator returns the plan's ingredients grouped into categories
+    ingredients = [
+        ingredient
+        for day in mock_meal_plan["days"]
+        for meal in day["meals"]
+        for ingredient in meal["ingredients"]
+    ]
+    categories, _ = MealPlanService.categorize_ingredients(dict.fromkeys(ingredients, 1))
+    mock_openai.return_value.generate_shopping_list = AsyncMock(return_value={
+        "user_id": "test-user-id",
+        "meal_plan_id": "test-meal-plan-id",
+        "items": categories
+    })
     
     # Make request
     response = client.post(
@@ -209,27 +222,24 @@ def test_generate_shopping_list(mock_openai, mock_supabase, mock_meal_plan, mock
     # Check response
     assert response.status_code == 200
     data = response.json()
-    assert data["id"] == "test-shopping-list-id"
+    assert uuid.UUID(data["id"]).version == 4
     assert data["user_id"] == "test-user-id"
     assert data["meal_plan_id"] == "test-meal-plan-id"
-    assert len(data["items"]) == 11
+    mock_openai.return_value.generate_shopping_list.assert_awaited_once_with(
+        user_id="test-user-id",
+        meal_plan_id="test-meal-plan-id"
+    )
     
-    # Check that items are categorized correctly
-    categories = set(item["category"] for item in data["items"])
-    assert "Produce" in categories
-    assert "Meat and Seafood" in categories
-    assert "Dairy and Eggs" in categories
-    assert "Grains and Bread" in categories
-    assert "Oils, Vinegars, and Condiments" in categories
-    
-    # Check that items have the correct fields
-    first_item = data["items"][0]
-    assert "item_name" in first_item
-    assert "quantity" in first_item
-    assert "unit" in first_item
-    assert "category" in first_item
-    assert "note" in first_item
-    assert "is_purchased" in first_item
+    # Check that items come back grouped by category
+    names = [category["name"] for category in data["items"]]
+    assert "Protein" in names
+    assert "Grains" in names
+    for category in data["items"]:
+        assert category["items"]
+        assert all({"item_name", "quantity", "unit", "note"} <= item.keys() for item in category["items"])
+    
+    # Generated lists are returned without being saved
+    mock_supabase.save_shopping_list.assert_not_called()
 
 @patch("api.router.supabase_service")
 def test_get_shopping_list(mock_supabase, mock_saved_shopping_list):
@@ -247,3 +257,138 @@ def test_get_shopping_list(mock_supabase, mock_saved_shopping_list):
     assert data["user_id"] == "test-user-id"
     assert data["meal_plan_id"] == "test-meal-plan-id"
     assert len(data["items"]) == 11
+
+@patch("api.router.supabase_service")
+def test_update_shopping_list_items(mock_supabase):
+    """Test marking several items purchased in one request"""
+    mock_supabase.update_shopping_list_items = AsyncMock(return_value=2)
+    first_id, second_id = str(uuid.uuid4()), str(uuid.uuid4())
+    
+    response = client.patch(
+        "/shopping-lists/test-shopping-list-id/items",
+        json=[
+            {"item_id": first_id, "is_purchased": True},
+            {"item_id": second_id, "is_purchased": False}
+        ]
+    )
+    
+    assert response.status_code == 200
+    assert response.json() == {"shopping_list_id": "test-shopping-list-id", "updated": 2}
+    mock_supabase.update_shopping_list_items.assert_awaited_once_with(
+        "test-shopping-list-id",
+        [{"item_id": first_id, "is_purchased": True}, {"item_id": second_id, "is_purchased": False}]
+    )
+
+@patch("api.router.supabase_service")
+def test_update_shopping_list_items_rejects_malformed_ids(mock_supabase):
+    """Test that malformed item IDs are rejected before reaching Supabase"""
+    mock_supabase.update_shopping_list_items = AsyncMock(return_value=0)
+    
+    app = FastAPI()
+    app.include_router(router)
+    response = TestClient(app).patch(
+        "/shopping-lists/test-shopping-list-id/items",
+        json=[{"item_id": "not-a-uuid", "is_purchased": True}]
+    )
+    
+    assert response.status_code == 422
+    mock_supabase.update_shopping_list_items.assert_not_awaited()
+
+@patch("api.router.supabase_service")
+def test_get_shopping_list_not_modified(mock_supabase, mock_saved_shopping_list):
+    """Test that a matching If-None-Match short-circuits with 304"""
+    mock_supabase.get_shopping_list = AsyncMock(return_value=mock_saved_shopping_list)
+    
+    first = client.get("/shopping-lists/test-shopping-list-id")
+    etag = first.headers["etag"]
+    
+    response = client.get("/shopping-lists/test-shopping-list-id", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    
+    # A changed list produces a new ETag and a full body
+    mock_saved_shopping_list["items"][0]["is_purchased"] = not mock_saved_shopping_list["items"][0].get("is_purchased", False)
+    response = client.get("/shopping-lists/test-shopping-list-id", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+@patch("api.router.get_openai_service")
+def test_generate_meal_plan_infeasible_request(mock_openai):
+    """Test that infeasible meal plan requests are rejected as client errors"""
+    mock_openai.return_value.generate_meal_plan = AsyncMock(
+        side_effect=InfeasibleProfileError("Meal plans must be between 1 and 14 days, got 30")
+    )
+    
+    app = FastAPI()
+    app.include_router(router)
+    response = TestClient(app).post("/meal-plans/generate", json={"days": 30})
+    
+    assert response.status_code == 422
+    assert "between 1 and 14 days" in response.json()["detail"]
+
+@patch("api.router.get_openai_service")
+def test_stream_meal_plan(mock_openai):
+    """Test that a generated meal plan is streamed day by day as server-sent events"""
+    async def days_stream(**kwargs):
+        for day_number in range(1, kwargs["days"] + 1):
+            yield {"day_number": day_number, "meals": []}
+    mock_openai.return_value.generate_meal_plan_stream = days_stream
+    
+    app = FastAPI()
+    app.include_router(router)
+    response = TestClient(app).post("/meal-plans/generate/stream", json={"days": 2, "user_id": "test-user-id"})
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [event.split("\n") for event in response.text.strip().split("\n\n")]
+    assert [lines[0] for lines in events] == ["event: plan", "event: day", "event: day", "event: done"]
+    assert json.loads(events[0][1][len("data: "):])["user_id"] == "test-user-id"
+    assert json.loads(events[2][1][len("data: "):])["day_number"] == 2
+
+@patch("api.router.get_openai_service")
+def test_stream_meal_plan_infeasible_request(mock_openai):
+    """Test that infeasible streamed meal plan requests are rejected before streaming starts"""
+    async def days_stream(**kwargs):
+        raise InfeasibleProfileError("Meal plans must be between 1 and 14 days, got 30")
+        yield
+    mock_openai.return_value.generate_meal_plan_stream = days_stream
+    
+    app = FastAPI()
+    app.include_router(router)
+    response = TestClient(app).post("/meal-plans/generate/stream", json={"days": 30})
+    
+    assert response.status_code == 422
+
+def test_categorize_ingredients_totals_amounts():
+    """Test that local categorization sums amounts of the same ingredient and unit"""
+    categories, unmatched = MealPlanService.categorize_ingredients({
+        "1/2 cup quinoa": 2,
+        "1 cup Quinoa": 1,
+        "4 oz grilled chicken": 3,
+        "1 1/2 cups milk": 1,
+        "1 tbsp honey": 1
+    })
+    
+    assert categories == [
+        {"name": "Protein", "items": [{"item_name": "grilled chicken", "quantity": "12", "unit": "oz", "note": ""}]},
+        {"name": "Grains", "items": [{"item_name": "quinoa", "quantity": "2", "unit": "cup", "note": ""}]},
+        {"name": "Dairy", "items": [{"item_name": "milk", "quantity": "1 1/2", "unit": "cup", "note": ""}]}
+    ]
+    assert unmatched == ["1 tbsp honey"]
+
+def test_categorize_ingredients_keeps_invalid_amounts():
+    """Test that amounts Fraction cannot parse are kept as written instead of failing"""
+    assert MealPlanService._parse_quantity("1/0 cup") is None
+    assert MealPlanService._parse_quantity("1.5/2 cups") is None
+    
+    categories, unmatched = MealPlanService.categorize_ingredients({
+        "1/0 cup rice": 1,
+        "1.5/2 cups milk": 2
+    })
+    
+    assert categories == [
+        {"name": "Grains", "items": [{"item_name": "rice", "quantity": "1/0 cup", "unit": "", "note": ""}]},
+        {"name": "Dairy", "items": [{"item_name": "milk", "quantity": "1.5/2 cups", "unit": "", "note": ""}]}
+    ]
+    assert unmatched == []
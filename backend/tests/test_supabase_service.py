@@ -2,8 +2,10 @@
 Tests for the Supabase service.
 """
 import os
+import asyncio
 import pytest
 import json
+import uuid
 from unittest.mock import patch, MagicMock, AsyncMock
 from httpx import Response
 from datetime import datetime
@@ -14,7 +16,11 @@ from api.supabase_service import (
     MealItem,
     DayPlan,
     ShoppingList,
-    ShoppingListItem
+    ShoppingListItem,
+    _get_client,
+    close_http_client,
+    _bulk_uuids,
+    _MEAL_PLAN_CACHE
 )
 
 class TestSupabaseService:
@@ -27,6 +33,7 @@ class TestSupabaseService:
         os.environ["SUPABASE_SERVICE_KEY"] = "test-service-key"
         
         self.supabase_service = SupabaseService()
+        _MEAL_PLAN_CACHE.clear()
         
         # Create test data
         self.meal_item = MealItem(
@@ -84,10 +91,10 @@ class TestSupabaseService:
     @pytest.mark.asyncio
     async def test_save_meal_plan(self):
         """Test saving a meal plan to Supabase."""
-        with patch("httpx.AsyncClient") as mock_client:
+        with patch("api.supabase_service._get_client", new_callable=AsyncMock) as mock_get_client:
             # Setup mock responses
             mock_client_instance = AsyncMock()
-            mock_client.return_value.__aenter__.return_value = mock_client_instance
+            mock_get_client.return_value = mock_client_instance
             
             # Mock meal plan response
             meal_plan_response = MagicMock()
@@ -107,10 +114,10 @@ class TestSupabaseService:
     @pytest.mark.asyncio
     async def test_save_meal_plan_error(self):
         """Test error handling when saving a meal plan."""
-        with patch("httpx.AsyncClient") as mock_client:
+        with patch("api.supabase_service._get_client", new_callable=AsyncMock) as mock_get_client:
             # Setup mock responses
             mock_client_instance = AsyncMock()
-            mock_client.return_value.__aenter__.return_value = mock_client_instance
+            mock_get_client.return_value = mock_client_instance
             
             # Mock meal plan response with error
             meal_plan_response = MagicMock()
@@ -127,10 +134,10 @@ class TestSupabaseService:
     @pytest.mark.asyncio
     async def test_save_shopping_list(self):
         """Test saving a shopping list to Supabase."""
-        with patch("httpx.AsyncClient") as mock_client:
+        with patch("api.supabase_service._get_client", new_callable=AsyncMock) as mock_get_client:
             # Setup mock responses
             mock_client_instance = AsyncMock()
-            mock_client.return_value.__aenter__.return_value = mock_client_instance
+            mock_get_client.return_value = mock_client_instance
             
             # Mock shopping list response
             shopping_list_response = MagicMock()
@@ -147,15 +154,67 @@ class TestSupabaseService:
             assert result["user_id"] == "test-user-123"
             assert result["meal_plan_id"] == "test-meal-plan-123"
     
+    @pytest.mark.asyncio
+    async def test_save_shopping_list_chunks_bulk_inserts(self):
+        """Test that large shopping lists are inserted in bounded bulk requests."""
+        with patch("api.supabase_service._get_client", new_callable=AsyncMock) as mock_get_client:
+            mock_client_instance = AsyncMock()
+            mock_get_client.return_value = mock_client_instance
+            
+            response = MagicMock()
+            response.status_code = 201
+            mock_client_instance.post.return_value = response
+            
+            item = self.shopping_list.items[0]
+            shopping_list = ShoppingList(
+                user_id="test-user-123",
+                meal_plan_id="test-meal-plan-123",
+                items=[item] * 1200
+            )
+            
+            await self.supabase_service.save_shopping_list(shopping_list)
+            
+            # Shopping list row, then 1200 items in chunks of 500, 500 and 200
+            item_calls = mock_client_instance.post.call_args_list[1:]
+            assert [len(call.kwargs["json"]) for call in item_calls] == [500, 500, 200]
+            assert all(call.kwargs["headers"]["Prefer"] == "return=minimal" for call in item_calls)
+    
+    @pytest.mark.asyncio
+    async def test_update_shopping_list_items(self):
+        """Test that item updates are sent as one RPC call and drop the cached list."""
+        with patch("api.supabase_service._get_client", new_callable=AsyncMock) as mock_get_client:
+            mock_client_instance = AsyncMock()
+            mock_get_client.return_value = mock_client_instance
+            
+            rpc_response = MagicMock()
+            rpc_response.status_code = 200
+            rpc_response.json.return_value = 2
+            mock_client_instance.post.return_value = rpc_response
+            
+            await self.supabase_service._shopping_list_cache.set("shopping_list:test-shopping-list-id", '{"id": "test-shopping-list-id"}')
+            patches = [
+                {"item_id": "item-1", "is_purchased": True},
+                {"item_id": "item-2", "is_purchased": True}
+            ]
+            
+            result = await self.supabase_service.update_shopping_list_items("test-shopping-list-id", patches)
+            
+            assert result == 2
+            mock_client_instance.post.assert_awaited_once()
+            args, kwargs = mock_client_instance.post.call_args
+            assert args[0].endswith("/rest/v1/rpc/bulk_update_items")
+            assert kwargs["json"] == {"list_id": "test-shopping-list-id", "patches": patches}
+            assert await self.supabase_service._shopping_list_cache.get("shopping_list:test-shopping-list-id") is None
+    
     @pytest.mark.asyncio
     async def test_get_meal_plan(self):
         """Test retrieving a meal plan from Supabase."""
-        with patch("httpx.AsyncClient") as mock_client:
+        with patch("api.supabase_service._get_client", new_callable=AsyncMock) as mock_get_client:
             # Setup mock responses
             mock_client_instance = AsyncMock()
-            mock_client.return_value.__aenter__.return_value = mock_client_instance
+            mock_get_client.return_value = mock_client_instance
             
-            # Mock meal plan response
+            # Mock meal plan response with its days and meals embedded
             meal_plan_response = MagicMock()
             meal_plan_response.status_code = 200
             meal_plan_response.json.return_value = [{
@@ -163,39 +222,25 @@ class TestSupabaseService:
                 "user_id": "test-user-123",
                 "dietary_profile_id": "test-profile-123",
                 "start_date": "2025-04-25",
-                "end_date": "2025-04-27"
-            }]
-            
-            # Mock days response
-            days_response = MagicMock()
-            days_response.status_code = 200
-            days_response.json.return_value = [{
-                "id": "test-day-id",
-                "meal_plan_id": "test-meal-plan-id",
-                "day_number": 1,
-                "date": "2025-04-25",
-                "total_calories": 500
+                "end_date": "2025-04-27",
+                "days": [{
+                    "id": "test-day-id",
+                    "meal_plan_id": "test-meal-plan-id",
+                    "day_number": 1,
+                    "date": "2025-04-25",
+                    "total_calories": 500,
+                    "meals": [{
+                        "id": "test-meal-id",
+                        "day_id": "test-day-id",
+                        "name": "Test Meal",
+                        "description": "A test meal",
+                        "meal_type": "breakfast",
+                        "calories": 500,
+                        "ingredients": json.dumps(["Ingredient 1", "Ingredient 2"])
+                    }]
+                }]
             }]
-            
-            # Mock meals response
-            meals_response = MagicMock()
-            meals_response.status_code = 200
-            meals_response.json.return_value = [{
-                "id": "test-meal-id",
-                "day_id": "test-day-id",
-                "name": "Test Meal",
-                "description": "A test meal",
-                "meal_type": "breakfast",
-                "calories": 500,
-                "ingredients": json.dumps(["Ingredient 1", "Ingredient 2"])
-            }]
-            
-            # Set up the mock responses in order
-            mock_client_instance.get.side_effect = [
-                meal_plan_response,
-                days_response,
-                meals_response
-            ]
+            mock_client_instance.get.return_value = meal_plan_response
             
             # Call the method
             result = await self.supabase_service.get_meal_plan("test-meal-plan-id")
@@ -208,14 +253,41 @@ class TestSupabaseService:
             assert len(result["days"][0]["meals"]) == 1
             assert result["days"][0]["meals"][0]["name"] == "Test Meal"
             assert isinstance(result["days"][0]["meals"][0]["ingredients"], list)
+            
+            # A repeat read is served from the cache without hitting Supabase
+            cached_result = await self.supabase_service.get_meal_plan("test-meal-plan-id")
+            assert cached_result == result
+            assert mock_client_instance.get.call_count == 1
+            assert mock_client_instance.get.call_args.kwargs["params"]["select"] == "*,days(*,meals(*))"
+    
+    @pytest.mark.asyncio
+    async def test_get_meal_plan_shares_concurrent_fetch(self):
+        """Test that concurrent reads of the same meal plan make one request."""
+        with patch("api.supabase_service._get_client", new_callable=AsyncMock) as mock_get_client:
+            mock_client_instance = AsyncMock()
+            mock_get_client.return_value = mock_client_instance
+            
+            meal_plan_response = MagicMock()
+            meal_plan_response.status_code = 200
+            meal_plan_response.json.return_value = [{"id": "test-meal-plan-id", "days": []}]
+            mock_client_instance.get.return_value = meal_plan_response
+            
+            first, second = await asyncio.gather(
+                self.supabase_service.get_meal_plan("test-meal-plan-id"),
+                self.supabase_service.get_meal_plan("test-meal-plan-id")
+            )
+            
+            assert first is second
+            assert mock_client_instance.get.call_count == 1
+            assert self.supabase_service._inflight_meal_plans == {}
     
     @pytest.mark.asyncio
     async def test_get_meal_plan_not_found(self):
         """Test retrieving a non-existent meal plan."""
-        with patch("httpx.AsyncClient") as mock_client:
+        with patch("api.supabase_service._get_client", new_callable=AsyncMock) as mock_get_client:
             # Setup mock responses
             mock_client_instance = AsyncMock()
-            mock_client.return_value.__aenter__.return_value = mock_client_instance
+            mock_get_client.return_value = mock_client_instance
             
             # Mock meal plan response with empty result
             meal_plan_response = MagicMock()
@@ -232,37 +304,28 @@ class TestSupabaseService:
     @pytest.mark.asyncio
     async def test_get_shopping_list(self):
         """Test retrieving a shopping list from Supabase."""
-        with patch("httpx.AsyncClient") as mock_client:
+        with patch("api.supabase_service._get_client", new_callable=AsyncMock) as mock_get_client:
             # Setup mock responses
             mock_client_instance = AsyncMock()
-            mock_client.return_value.__aenter__.return_value = mock_client_instance
+            mock_get_client.return_value = mock_client_instance
             
-            # Mock shopping list response
+            # Mock shopping list response with its items embedded
             shopping_list_response = MagicMock()
             shopping_list_response.status_code = 200
             shopping_list_response.json.return_value = [{
                 "id": "test-shopping-list-id",
                 "user_id": "test-user-123",
-                "meal_plan_id": "test-meal-plan-123"
+                "meal_plan_id": "test-meal-plan-123",
+                "items": [{
+                    "id": "test-item-id",
+                    "shopping_list_id": "test-shopping-list-id",
+                    "item_name": "Test Item",
+                    "quantity": "1 cup",
+                    "category": "Produce",
+                    "is_purchased": False
+                }]
             }]
-            
-            # Mock items response
-            items_response = MagicMock()
-            items_response.status_code = 200
-            items_response.json.return_value = [{
-                "id": "test-item-id",
-                "shopping_list_id": "test-shopping-list-id",
-                "item_name": "Test Item",
-                "quantity": "1 cup",
-                "category": "Produce",
-                "is_purchased": False
-            }]
-            
-            # Set up the mock responses in order
-            mock_client_instance.get.side_effect = [
-                shopping_list_response,
-                items_response
-            ]
+            mock_client_instance.get.return_value = shopping_list_response
             
             # Call the method
             result = await self.supabase_service.get_shopping_list("test-shopping-list-id")
@@ -273,3 +336,56 @@ class TestSupabaseService:
             assert len(result["items"]) == 1
             assert result["items"][0]["item_name"] == "Test Item"
             assert result["items"][0]["category"] == "Produce"
+            
+            # A repeat read is served from the cache without hitting Supabase
+            cached_result = await self.supabase_service.get_shopping_list("test-shopping-list-id")
+            assert cached_result == result
+            assert mock_client_instance.get.call_count == 1
+    
+    @pytest.mark.asyncio
+    async def test_get_shopping_list_direct_sql(self):
+        """Test that a configured Postgres pool serves the read without PostgREST."""
+        row = json.dumps({
+            "id": "test-shopping-list-id",
+            "user_id": "test-user-123",
+            "meal_plan_id": "test-meal-plan-123",
+            "items": [{"item_name": "Test Item", "quantity": "1 cup", "category": "Produce", "is_purchased": False}]
+        })
+        mock_pool = MagicMock()
+        mock_pool.fetchval = AsyncMock(return_value=row)
+        
+        with patch("api.supabase_service._get_db_pool", new_callable=AsyncMock) as mock_get_pool, \
+                patch("api.supabase_service._get_client", new_callable=AsyncMock) as mock_get_client:
+            mock_get_pool.return_value = mock_pool
+            
+            result = await self.supabase_service.get_shopping_list("test-shopping-list-id")
+            
+            assert result["id"] == "test-shopping-list-id"
+            assert result["items"][0]["item_name"] == "Test Item"
+            mock_pool.fetchval.assert_awaited_once()
+            assert mock_pool.fetchval.call_args.args[1] == "test-shopping-list-id"
+            mock_get_client.assert_not_called()
+            
+            # A missing row is reported as not found
+            mock_pool.fetchval.return_value = None
+            assert await self.supabase_service.get_shopping_list("missing-id") is None
+    
+    @pytest.mark.asyncio
+    async def test_shared_http_client(self):
+        """Test that the HTTP client is created once and reused across calls."""
+        first = await _get_client()
+        second = await _get_client()
+        
+        assert first is second
+        
+        await close_http_client()
+        assert first.is_closed
+    
+    def test_bulk_uuids(self):
+        """Test that bulk-generated IDs are distinct, valid UUID4 strings."""
+        ids = _bulk_uuids(50)
+        
+        assert len(ids) == 50
+        assert len(set(ids)) == 50
+        assert all(uuid.UUID(i).version == 4 for i in ids)
+        assert _bulk_uuids(0) == []